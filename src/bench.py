@@ -0,0 +1,148 @@
+import argparse
+import json
+import math
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from static import *
+from headless import Simulation
+
+# Named simulation scenarios timed through Arena.tick. Each scenario returns
+# a prepared Simulation and the input script to replay on it.
+
+
+
+def dungeon(seed : int) -> Simulation:
+    sim = Simulation(None, seed)
+    room = sim.arena.generateRoomDungeon(0, 0)
+    for entity in list(room.entities):
+        if entity.opponent:
+            room.removeEntity(entity)
+    sim.arena.rooms[(0, 0)] = room
+    sim.arena.enterRoom(0, 0)
+    sim.arena.player.x, sim.arena.player.y = 0, 8
+    return sim
+
+def ring(sim : Simulation, _id : str, amount : int, radius : float, x : float = 0.0, y : float = 0.0):
+    for e in range(amount):
+        angle = 2 * math.pi * e / amount
+        sim.arena.newEntity(_id, x + radius * math.cos(angle), y + radius * math.sin(angle))
+
+
+def scenarioExplosions(seed : int):
+    sim = dungeon(seed)
+    ring(sim, "spider", 12, 4)
+    ring(sim, "explosive_spider", 6, 2)
+    for entity in sim.arena.player.getRoom().entities:
+        if entity.id == "explosive_spider":
+            entity.tick()
+            entity.damage(1)
+    return sim, [{"ticks": FRAMERATE * 4}]
+
+def scenarioTurret(seed : int):
+    sim = dungeon(seed)
+    sim.arena.newEntity("turret", 0, 4)
+    ring(sim, "spider", 24, 5)
+    ring(sim, "spider", 16, 3)
+    return sim, [{"ticks": FRAMERATE * 10}]
+
+def scenarioMachineGun(seed : int):
+    sim = dungeon(seed)
+    item = sim.arena.player.item = Item(sim.arena, "machine_gun")
+    # a magazine deep enough that the trigger stays held for the whole run without reloading
+    item.max_ammo = item.ammo = FRAMERATE * 10
+    ring(sim, "spider", 12, 4)
+    return sim, [{"ticks": FRAMERATE * 10, "hold": True, "aim": [0, -5]}]
+
+def scenarioAuraBlade(seed : int):
+    sim = dungeon(seed)
+    sim.arena.player.item = Item(sim.arena, "aura_blade")
+    ring(sim, "spider", 16, 1.75, 0, 8)
+    ring(sim, "spider", 16, 3, 0, 8)
+    return sim, [{"ticks": FRAMERATE * 10, "aim": [0, -2]}]
+
+def scenarioExplored(seed : int):
+    sim = Simulation(None, seed)
+    side = math.ceil(math.sqrt(2000))
+    for rx in range(-side // 2, side - side // 2):
+        for ry in range(-side // 2, side - side // 2):
+            if len(sim.arena.rooms) >= 2000: break
+            sim.arena.newRoom(rx, ry)
+    sim.arena.enterRoom(0, 0)
+    return sim, [
+        {"ticks": FRAMERATE * 2, "keys": keys} for keys in ("d", "s", "a", "w") * 2
+    ]
+
+SCENARIOS = {
+    "explosions": scenarioExplosions,
+    "turret_horde": scenarioTurret,
+    "machine_gun": scenarioMachineGun,
+    "aura_blade": scenarioAuraBlade,
+    "explored_world": scenarioExplored,
+}
+
+
+def percentile(values : list[int], q : float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+def measure(name : str, seed : int = 0) -> dict:
+    sim, script = SCENARIOS[name](seed)
+    timings : list[int] = []
+    start = time.perf_counter()
+    sim.run(script, timings)
+    elapsed = time.perf_counter() - start
+
+    # allocations are measured on a separate run so tracing does not skew the timings
+    tracemalloc.start()
+    sim, script = SCENARIOS[name](seed)
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    sim.run(script)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        "ticks": len(timings),
+        "tps": len(timings) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(timings, 0.50) / 1e6,
+        "p99_ms": percentile(timings, 0.99) / 1e6,
+        "max_ms": max(timings) / 1e6,
+        "peak_alloc_bytes": peak,
+    }
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Time simulation scenarios through Arena.tick.")
+    parser.add_argument("scenarios", nargs = "*", help = f"subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("-o", "--out", help = "write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "commit": revision(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "scenarios": {},
+    }
+    for name in args.scenarios or SCENARIOS:
+        report["scenarios"][name] = measure(name, args.seed)
+
+    text = json.dumps(report, indent = 4)
+    if args.out:
+        with open(args.out, "w") as target:
+            target.write(text)
+            target.close()
+    print(text)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import random
+import time
+
+from static import *
+
+# Runs Arena without pygame. Scripts are JSON lists of steps such as
+#   {"ticks": 120, "keys": "wd", "aim": [3, 0], "hold": true, "press": ["apply"]}
+# "aim" is relative to the player, "press" fires once on the first tick of the step.
+
+
+
+class Simulation:
+
+    def __init__(self, save : str | None = None, seed : int | None = None, data : dict | None = None):
+        if seed is not None:
+            random.seed(seed)
+        self.arena = Arena(save, data)
+        self.ticks : int = 0
+
+    def point(self, aim : tuple[float, float]) -> tuple[float, float]:
+        return (
+            self.arena.player.x + aim[0],
+            self.arena.player.y + aim[1],
+        )
+
+    def step(
+        self,
+        keys : str = "",
+        aim : tuple[float, float] = (1.0, 0.0),
+        hold : bool = False,
+        press : tuple[str, ...] = (),
+    ):
+        arena = self.arena
+        player = arena.player
+
+        for action in press:
+            match action:
+
+                case "apply":
+                    if player.item:
+                        player.item.apply(self.point(aim))
+
+                case "interact":
+                    arena.interact(self.point(aim))
+
+                case "reload":
+                    if player.item:
+                        if player.item.type == "SHOOTER":
+                            player.item.reload()
+
+        if hold:
+            if player.item:
+                player.item.dapply(self.point(aim))
+
+        if "w" in keys:
+            player.moveY(-player.speed)
+        if "a" in keys:
+            player.moveX(-player.speed)
+        if "s" in keys:
+            player.moveY(player.speed)
+        if "d" in keys:
+            player.moveX(player.speed)
+
+        arena.tick()
+        self.ticks += 1
+
+    def run(self, script : list[dict], timings : list[int] | None = None):
+        for entry in script:
+            for i in range(entry.get("ticks", 1)):
+                start = time.perf_counter_ns()
+                self.step(
+                    entry.get("keys", ""),
+                    tuple(entry.get("aim", (1.0, 0.0))),
+                    entry.get("hold", False),
+                    tuple(entry.get("press", ())) if i == 0 else (),
+                )
+                if timings is not None:
+                    timings.append(time.perf_counter_ns() - start)
+
+    def summary(self) -> dict:
+        player = self.arena.player
+        room = player.getRoom()
+        return {
+            "ticks": self.ticks,
+            "rooms": len(self.arena.rooms),
+            "rx": player.rx,
+            "ry": player.ry,
+            "x": player.x,
+            "y": player.y,
+            "hp": player.hp,
+            "item": player.item.id if player.item else None,
+            "entities": len(room.entities) if room else 0,
+            "particles": len(room.particles) if room else 0,
+        }
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Step Arena.tick without a display.")
+    parser.add_argument("-s", "--save", help = "save file to start from")
+    parser.add_argument("--seed", type = int, help = "seed for a fresh world")
+    parser.add_argument("--script", help = "JSON input script")
+    parser.add_argument("-t", "--ticks", type = int, default = FRAMERATE * 60, help = "idle ticks when no script is given")
+    parser.add_argument("-o", "--out", help = "write the resulting world to this save file")
+    args = parser.parse_args()
+
+    sim = Simulation(args.save, args.seed)
+
+    if args.script:
+        with open(args.script, "r") as source:
+            script = json.load(source)
+            source.close()
+    else:
+        script = [{"ticks": args.ticks}]
+
+    start = time.perf_counter()
+    sim.run(script)
+    elapsed = time.perf_counter() - start
+
+    if args.out:
+        sim.arena.path = args.out
+        sim.arena.saveGame()
+
+    result = sim.summary()
+    result["seconds"] = elapsed
+    result["tps"] = sim.ticks / elapsed if elapsed else 0.0
+    print(json.dumps(result))
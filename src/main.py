@@ -1,8 +1,10 @@
 import pygame
 from static import *
+from render import *
 
 import sys
 import os
+import time
 
 DEBUG = False
 for i in ("-d", "-debug"):
@@ -10,6 +12,13 @@ for i in ("-d", "-debug"):
         DEBUG = True
         break
 
+# present only the screen regions that changed instead of the whole frame
+DIRTY = False
+for i in ("-dirty", "--dirty"):
+    if i in sys.argv:
+        DIRTY = True
+        break
+
 pygame.init()
 screen = pygame.display.set_mode(
     (WIDTH, HEIGHT), pygame.NOFRAME,
@@ -20,8 +29,27 @@ pygame.mouse.set_visible(0)
 IMAGES = {
     _id.removesuffix(".png") : pygame.image.load(f"src/make/{_id}").convert_alpha() for _id in os.listdir("src/make")
 }
+PARTICLEIMAGES : list[tuple[pygame.Surface, int, int]] = []
+
+background = Background(IMAGES)
+sprites = Sprites(IMAGES)
+minimap = Minimap(IMAGES)
+worldmap = WorldMap(IMAGES)
+hud = Hud(IMAGES)
+regions = Regions((WIDTH, HEIGHT)) if DIRTY else None
 
 arena = Arena("src/gsave.json")
+arena.autosave = FRAMERATE * 30
+# frames can be drawn before the first step, so a save without the player's room gets it now
+if not arena.current:
+    arena.enterRoom(arena.player.rx, arena.player.ry)
+
+profiler = None
+if DEBUG:
+    profiler = Profiler()
+    overlay = Overlay()
+    arena.profiler = profiler
+
 # arena.newEntity("methane_can", 4, 4)
 # arena.newEntity("item", 4, 4, item_id = "sword")
 arena.saveGame()
@@ -31,9 +59,19 @@ arena.saveGame()
 mouseL = False
 mouseR = False
 
+# the simulation always steps at FRAMERATE; frames are drawn up to RENDERRATE,
+# interpolated between the last two steps. MAXSTEPS bounds the catch-up after a stall
+RENDERRATE = 240
+MAXSTEPS = 5
+STEP = 1 / FRAMERATE
+accumulator = 0.0
+last = time.perf_counter()
+
 running = True
 while running:
 
+    if profiler: profiler.begin()
+
     mouseX, mouseY = pygame.mouse.get_pos()
     mouseAngle = math.atan2(
         mouseY - HEIGHT // 2, mouseX - WIDTH // 2,
@@ -54,6 +92,9 @@ while running:
                     if arena.player.item.type == "SHOOTER":
                         arena.player.item.reload()
 
+            elif e.key == pygame.K_m:
+                worldmap.toggle()
+
         if e.type == pygame.MOUSEBUTTONDOWN:
 
             if e.button == 1:
@@ -70,14 +111,7 @@ while running:
                     ((mouseX - WIDTH / 2) / arena.scale) + camX,
                     ((mouseY - HEIGHT / 2) / arena.scale) + camY,
                 )
-                for entity in arena.player.getRoom().entities:
-                    if not entity.interactable: continue
-                    distance = math.sqrt((arena.player.x - point[0]) ** 2 + (arena.player.y - point[1]) ** 2)
-                    if distance > 7: continue
-                    if entity.x - entity.w / 2 <= point[0] <= entity.x + entity.w / 2:
-                        if entity.y - entity.h / 2 <= point[1] <= entity.y + entity.h / 2:
-                            entity.interact()
-                            break
+                arena.interact(point)
 
         if e.type == pygame.MOUSEBUTTONUP:
 
@@ -89,142 +123,85 @@ while running:
 
     if not running: break
 
-    if mouseL:
-        if arena.player.item:
-            arena.player.item.dapply((
-                ((mouseX - WIDTH / 2) / arena.scale) + camX,
-                ((mouseY - HEIGHT / 2) / arena.scale) + camY,
-            ))
+    if profiler: profiler.lap("input")
+
+    now = time.perf_counter()
+    accumulator = min(accumulator + now - last, STEP * MAXSTEPS)
+    last = now
 
     keymap = pygame.key.get_pressed()
-    if keymap[pygame.K_w]:
-        arena.player.moveY(-arena.player.speed)
-    if keymap[pygame.K_a]:
-        arena.player.moveX(-arena.player.speed)
-    if keymap[pygame.K_s]:
-        arena.player.moveY(arena.player.speed)
-    if keymap[pygame.K_d]:
-        arena.player.moveX(arena.player.speed)
-
-    arena.tick()
-    camX, camY = arena.camera.get()
+    while accumulator >= STEP:
+        accumulator -= STEP
 
-    screen.fill("#030303")
+        if mouseL:
+            if arena.player.item:
+                arena.player.item.dapply((
+                    ((mouseX - WIDTH / 2) / arena.scale) + camX,
+                    ((mouseY - HEIGHT / 2) / arena.scale) + camY,
+                ))
 
-    for x in range(arena.player.getRoom().w):
-        for y in range(arena.player.getRoom().h):
-            img = IMAGES.get("tile_base")
-            screen.blit(
-                img, (
-                    (x - arena.player.getRoom().w / 2 - camX) * arena.scale + WIDTH // 2,
-                    (y - arena.player.getRoom().h / 2 - camY) * arena.scale + HEIGHT // 2,
-                )
-            )
+        if keymap[pygame.K_w]:
+            arena.player.moveY(-arena.player.speed)
+        if keymap[pygame.K_a]:
+            arena.player.moveX(-arena.player.speed)
+        if keymap[pygame.K_s]:
+            arena.player.moveY(arena.player.speed)
+        if keymap[pygame.K_d]:
+            arena.player.moveX(arena.player.speed)
 
-    for block in arena.player.getRoom().layout:
-        # pygame.draw.rect(
-        #     screen, "#FFFFFF",
-        #     (
-        #         (block.x - block.w / 2 - camX) * arena.scale + WIDTH // 2,
-        #         (block.y - block.h / 2 - camY) * arena.scale + HEIGHT // 2,
-        #         block.w * arena.scale,
-        #         block.h * arena.scale,
-        #     )
-        # )
-        for dx in range(math.floor(block.w)):
-            for dy in range(math.floor(block.h)):
-                img = IMAGES.get("tile_ceil")
-                screen.blit(
-                    img, (
-                        (block.x + dx - block.w / 2 - camX) * arena.scale + WIDTH // 2,
-                        (block.y + dy - block.h / 2 - camY) * arena.scale + HEIGHT // 2,
-                    )
-                )
+        arena.tick()
+        if profiler: profiler.commitStep()
 
-        # for dx in range(math.floor(block.w)):
-        #     # print(block.y + dy - block.h / 2 - 1, arena.player.getRoom().h / 2)
-        #     if block.y + dy - 1 != arena.player.getRoom().h / 2:
-        #         img = IMAGES.get("tile_wall_front")
-        #         screen.blit(
-        #             img, (
-        #                 (block.x + dx - block.w / 2 - camX) * arena.scale + WIDTH // 2,
-        #                 (block.y + dy - block.h / 2 - camY) * arena.scale + HEIGHT // 2,
-        #             )
-        #         )
-
-        # if block.y + dy - 1 != arena.player.getRoom().h / 2:
-        #     pygame.draw.rect(
-        #         screen, "#FFFF00",
-        #         (
-        #             (block.x - block.w / 2 - camX) * arena.scale + WIDTH // 2,
-        #             (block.y - block.h / 2 - camY) * arena.scale + HEIGHT // 2,
-        #             block.w * arena.scale,
-        #             (block.h - 1) * arena.scale + 4,
-        #         ), 4,
-        #     )
-        # else:
-        #     pygame.draw.rect(
-        #         screen, "#FFFF00",
-        #         (
-        #             (block.x - block.w / 2 - camX) * arena.scale + WIDTH // 2,
-        #             (block.y - block.h / 2 - camY) * arena.scale + HEIGHT // 2,
-        #             block.w * arena.scale,
-        #             block.h * arena.scale,
-        #         ), 4,
-        #     )
-        pygame.draw.rect(
-            screen, "#FFFF00",
-            (
-                (block.x - block.w / 2 - camX) * arena.scale + WIDTH // 2,
-                (block.y - block.h / 2 - camY) * arena.scale + HEIGHT // 2,
-                block.w * arena.scale,
-                block.h * arena.scale,
-            ), 4,
-        )
+    alpha = accumulator / STEP
+    motion = alpha if arena.stepped else 1.0
+    camX, camY = arena.camera.get(alpha)
+    playerX, playerY = arena.camera.lerp(alpha)
 
-    pygame.draw.rect(
-        screen, "#030303",
-        (
-            (-arena.player.getRoom().w / 2 - camX) * arena.scale + WIDTH // 2 - 2,
-            (-arena.player.getRoom().h / 2 - camY) * arena.scale + HEIGHT // 2 - 2,
-            arena.player.getRoom().w * arena.scale + 4,
-            arena.player.getRoom().h * arena.scale + 4,
-        ), 8,
-    )
+    if profiler: profiler.lap("tick")
 
-    pygame.draw.rect(
+    screen.fill("#030303")
+
+    # everything the world draws, so the dirty region covers what leaves the room
+    drawn : list[pygame.Rect] = []
+
+    background.draw(screen, arena.player.getRoom(), arena.scale, camX, camY)
+
+    if profiler: profiler.lap("background")
+
+    drawn.append(pygame.draw.rect(
         screen, "#FFFFFF",
         (
-            (arena.player.x - arena.player.w / 2 - camX) * arena.scale + WIDTH // 2,
-            (arena.player.y - arena.player.h / 2 - camY) * arena.scale + HEIGHT // 2,
+            (playerX - arena.player.w / 2 - camX) * arena.scale + WIDTH // 2,
+            (playerY - arena.player.h / 2 - camY) * arena.scale + HEIGHT // 2,
             arena.player.w * arena.scale,
             arena.player.h * arena.scale,
         )
-    )
+    ))
 
     if arena.player.item != None:
 
-        img = IMAGES.get(f"item_{arena.player.item.id}")
-        if math.cos(mouseAngle) < 0:
-            img = pygame.transform.flip(img, 0, 1)
-        img = pygame.transform.rotate(img, 180)
-        # img = pygame.transform.rotate(img, -90) #
-        img = pygame.transform.rotate(img, mouseAngle * 180 / math.pi)
-        img = pygame.transform.flip(img, 0, 1)
+        # flip, rotate by 180 and the aim angle, flip back: one rotation of the mirrored sprite
+        img = sprites.get(
+            f"item_{arena.player.item.id}",
+            -(mouseAngle * 180 / math.pi + 180),
+            math.cos(mouseAngle) >= 0,
+        )
 
         aimX = arena.scale * arena.player.w * math.cos(mouseAngle)
         aimY = arena.scale * arena.player.h * math.sin(mouseAngle)
 
-        screen.blit(
+        drawn.append(screen.blit(
             img, (
                 WIDTH // 2 + aimX - img.get_width() // 2,
                 HEIGHT // 2 + aimY - img.get_height() // 2,
             )
-        )
+        ))
 
     for entity in arena.player.getRoom().entities:
 
         key, angle = entity.animate()
+        entityX = entity.px + (entity.x - entity.px) * motion
+        entityY = entity.py + (entity.y - entity.py) * motion
 
         # print(entity.id, entity.destroyTimer) #
         if entity.destroyTimer > FRAMERATE // 2:
@@ -237,63 +214,80 @@ while running:
             #         (entity.y - camY) * arena.scale + HEIGHT // 2,
             #     )
             delta = (FRAMERATE // 2 - entity.destroyTimer) / (FRAMERATE // 2) * 10
-            pygame.draw.circle(
+            drawn.append(pygame.draw.circle(
                 screen, "#FFFFFF", (
-                    (entity.x - camX) * arena.scale + WIDTH // 2,
-                    (entity.y - camY - delta) * arena.scale + HEIGHT // 2,
+                    (entityX - camX) * arena.scale + WIDTH // 2,
+                    (entityY - camY - delta) * arena.scale + HEIGHT // 2,
                 ), (entity.w + entity.h) / 4 * arena.scale,
-            )
-            pygame.draw.polygon(
+            ))
+            drawn.append(pygame.draw.polygon(
                 screen, "#FFFFFF", (
                     (
-                        (entity.x - camX - entity.w / 2) * arena.scale + WIDTH // 2,
-                        (entity.y - camY - delta) * arena.scale + HEIGHT // 2,
+                        (entityX - camX - entity.w / 2) * arena.scale + WIDTH // 2,
+                        (entityY - camY - delta) * arena.scale + HEIGHT // 2,
                     ),
                     (
-                        (entity.x - camX + entity.w / 2) * arena.scale + WIDTH // 2,
-                        (entity.y - camY - delta) * arena.scale + HEIGHT // 2,
+                        (entityX - camX + entity.w / 2) * arena.scale + WIDTH // 2,
+                        (entityY - camY - delta) * arena.scale + HEIGHT // 2,
                     ),
                     (
-                        (entity.x - camX) * arena.scale + WIDTH // 2,
-                        (entity.y - camY + entity.h * 2 - delta) * arena.scale + HEIGHT // 2,
+                        (entityX - camX) * arena.scale + WIDTH // 2,
+                        (entityY - camY + entity.h * 2 - delta) * arena.scale + HEIGHT // 2,
                     ),
                 )
-            )
+            ))
             continue
 
         # print(key) #
-        img = IMAGES.get(key).copy()
-        if angle != 0:
-            img = pygame.transform.rotate(img, angle)
-        screen.blit(
+        img = sprites.get(key, angle)
+        drawn.append(screen.blit(
             img, (
-                (entity.x - camX) * arena.scale + WIDTH // 2 - img.get_width() // 2,
-                (entity.y - camY) * arena.scale + HEIGHT // 2 - img.get_height() // 2,
+                (entityX - camX) * arena.scale + WIDTH // 2 - img.get_width() // 2,
+                (entityY - camY) * arena.scale + HEIGHT // 2 - img.get_height() // 2,
             )
-        )
-
-    for particle in arena.player.getRoom().particles:
-
-        img = IMAGES.get(f"particle_{particle.id}")
-        screen.blit(
-            img, (
-                (particle.x - camX) * arena.scale + WIDTH // 2 - img.get_width() // 2,
-                (particle.y - camY) * arena.scale + HEIGHT // 2 - img.get_height() // 2,
-            )
-        )
+        ))
+
+    if profiler: profiler.lap("entities")
+
+    particles = arena.player.getRoom().particles
+    if particles.count:
+
+        while len(PARTICLEIMAGES) < len(PARTICLES):
+            img = IMAGES.get(f"particle_{PARTICLES[len(PARTICLEIMAGES)]}")
+            PARTICLEIMAGES.append((img, img.get_width() // 2, img.get_height() // 2))
+
+        n = particles.count
+        # step back along the last tick's velocity to draw between ticks
+        pos = particles.pos[:n] - (particles.vel[:n] - particles.acc[:n]) * (1 - motion)
+        screenX = ((pos[:, 0] - camX) * arena.scale + WIDTH // 2).tolist()
+        screenY = ((pos[:, 1] - camY) * arena.scale + HEIGHT // 2).tolist()
+        blits = []
+        for sprite, x, y in zip(particles.sprite[:n].tolist(), screenX, screenY):
+            img, ox, oy = PARTICLEIMAGES[sprite]
+            blits.append((img, (x - ox, y - oy)))
+        screen.blits(blits, False)
+        if regions:
+            padX = max(img.get_width() for img, ox, oy in PARTICLEIMAGES)
+            padY = max(img.get_height() for img, ox, oy in PARTICLEIMAGES)
+            left, top = min(screenX), min(screenY)
+            drawn.append(pygame.Rect(left - padX, top - padY, max(screenX) - left + padX * 2, max(screenY) - top + padY * 2))
+
+    if profiler: profiler.lap("particles")
 
     for light in arena.player.getRoom().light:
 
         lim = IMAGES.get("light")
-        alpha = round((light.lum / 120) * 255)
-        lim.set_alpha(alpha)
+        lightAlpha = round((light.lum / 120) * 255)
+        lim.set_alpha(lightAlpha)
 
-        screen.blit(
+        drawn.append(screen.blit(
             lim, (
                 (light.x - camX) * arena.scale + WIDTH // 2 - lim.get_width() // 2,
                 (light.y - camY) * arena.scale + HEIGHT // 2 - lim.get_height() // 2,
             )
-        )
+        ))
+
+    if profiler: profiler.lap("lights")
 
     if arena.transtimer > 0:
 
@@ -375,132 +369,43 @@ while running:
 
 
 
+    if profiler: profiler.lap("transition")
+
     img = IMAGES.get("aim")
 
     point = (
         ((mouseX - WIDTH / 2) / arena.scale) + camX,
         ((mouseY - HEIGHT / 2) / arena.scale) + camY,
     )
-    for entity in arena.player.getRoom().entities:
-        if not entity.interactable: continue
-        distance = math.sqrt((arena.player.x - point[0]) ** 2 + (arena.player.y - point[1]) ** 2)
-        if distance > 7: continue
-        if entity.x - entity.w / 2 <= point[0] <= entity.x + entity.w / 2:
-            if entity.y - entity.h / 2 <= point[1] <= entity.y + entity.h / 2:
-                img = IMAGES.get("aim_interact")
-
-    screen.blit(
+    if arena.pick(point):
+        img = IMAGES.get("aim_interact")
+
+    cursor = screen.blit(
         img, (
             mouseX - img.get_width() // 2,
             mouseY - img.get_height() // 2,
         )
     )
+    cursorImage = img
 
 
-    heart = IMAGES.get("heart_icon")
-    total = arena.player.hp * heart.get_width()
-    for i in range(arena.player.hp):
-        screen.blit(
-            heart, (
-                WIDTH // 2 - total // 2 + i * heart.get_width(),
-                HEIGHT - 20 - heart.get_height(),
-            )
-        )
-
-    if arena.player.item:
-        # print(arena.player.item.id, arena.player.item.max_ammo, arena.player.item.ammo) #
-        if arena.player.item.type == "SHOOTER":
-            ammo = IMAGES.get("bullet_icon")
-            ammo_used = IMAGES.get("bullet_used_icon")
-            total = arena.player.item.max_ammo * ammo.get_width()
-            for i in range(arena.player.item.max_ammo):
-                screen.blit(
-                    ammo if i < arena.player.item.ammo else ammo_used, (
-                        WIDTH // 2 - total // 2 + i * ammo.get_width(),
-                        HEIGHT - 40 - heart.get_height() - ammo.get_height(),
-                    )
-                )
-
+    hud.draw(screen, arena)
 
-    for dx in range(-2, 2 + 1, 1):
-        for dy in range(-2, 2 + 1, 1):
-            mx = arena.player.rx + dx
-            my = arena.player.ry + dy
 
-            room = arena.getRoom(mx, my)
-            if not room:
-                img = IMAGES.get("map_null")
-            else:
-                img = IMAGES.get(f"map_{room.type}")
-                if not img:
-                    img = IMAGES.get("map_null")
-
-            bx = 25 + (dx + 2) * 50
-            by = HEIGHT - (25 + 50 * 5) + (dy + 2) * 50
-
-            screen.blit(
-                img, (bx, by)
-            )
-
-            if room:
-                if room.ew:
-                    pygame.draw.line(
-                        screen, "#7F7F7F",
-                        (
-                            bx + 20,
-                            by ,
-                        ),
-                        (
-                            bx + 20,
-                            by - 5,
-                        ), 5,
-                    )
-                if room.es:
-                    pygame.draw.line(
-                        screen, "#7F7F7F",
-                        (
-                            bx + 20,
-                            by + 40,
-                        ),
-                        (
-                            bx + 20,
-                            by + 40 + 5,
-                        ), 5,
-                    )
-                if room.ea:
-                    pygame.draw.line(
-                        screen, "#7F7F7F",
-                        (
-                            bx ,
-                            by + 20,
-                        ),
-                        (
-                            bx - 5,
-                            by + 20,
-                        ), 5,
-                    )
-                if room.ed:
-                    pygame.draw.line(
-                        screen, "#7F7F7F",
-                        (
-                            bx + 40,
-                            by + 20,
-                        ),
-                        (
-                            bx + 40 + 5,
-                            by + 20,
-                        ), 5,
-                    )
+    if profiler: profiler.lap("hud")
 
+    minimap.draw(screen, arena, 25, HEIGHT - (25 + 50 * 5))
+    worldmap.draw(screen, arena)
 
+    if profiler: profiler.lap("minimap")
 
     if DEBUG:
 
         pygame.draw.rect(
             screen, "#FF0000",
             (
-                (arena.player.x - arena.player.w / 2 - camX) * arena.scale + WIDTH // 2,
-                (arena.player.y - arena.player.h / 2 - camY) * arena.scale + HEIGHT // 2,
+                (playerX - arena.player.w / 2 - camX) * arena.scale + WIDTH // 2,
+                (playerY - arena.player.h / 2 - camY) * arena.scale + HEIGHT // 2,
                 arena.player.w * arena.scale,
                 arena.player.h * arena.scale,
             ), 4,
@@ -508,11 +413,13 @@ while running:
 
         for entity in arena.player.getRoom().entities:
 
+            entityX = entity.px + (entity.x - entity.px) * motion
+            entityY = entity.py + (entity.y - entity.py) * motion
             pygame.draw.rect(
                 screen, "#FF0000",
                 (
-                    (entity.x - entity.w / 2 - camX) * arena.scale + WIDTH // 2,
-                    (entity.y - entity.h / 2 - camY) * arena.scale + HEIGHT // 2,
+                    (entityX - entity.w / 2 - camX) * arena.scale + WIDTH // 2,
+                    (entityY - entity.h / 2 - camY) * arena.scale + HEIGHT // 2,
                     entity.w * arena.scale,
                     entity.h * arena.scale,
                 ), 4,
@@ -528,5 +435,45 @@ while running:
             ), 4,
         )
 
-    pygame.display.update()
-    clock.tick(FRAMERATE)
\ No newline at end of file
+        overlay.draw(screen, profiler, arena.player.getRoom())
+        profiler.lap("debug")
+
+    if regions:
+        room = arena.player.getRoom()
+        # between steps interpolated entities and particles still move every frame
+        moving = motion < 1 and (
+            room.particles.count or any(entity.x != entity.px or entity.y != entity.py for entity in room.entities)
+        )
+        regions.mark(
+            "world",
+            (
+                arena.steps, arena.transtimer, room, round(camX * arena.scale), round(camY * arena.scale),
+                motion if moving else None, mouseAngle,
+            ),
+            pygame.Rect(
+                (-room.w / 2 - camX) * arena.scale + WIDTH // 2 - BORDER,
+                (-room.h / 2 - camY) * arena.scale + HEIGHT // 2 - BORDER,
+                room.w * arena.scale + BORDER * 2,
+                room.h * arena.scale + BORDER * 2,
+            ).unionall(drawn),
+        )
+        regions.mark("hud", hud.key, hud.rect)
+        regions.mark(
+            "minimap",
+            (arena.player.rx, arena.player.ry, len(arena.rooms)),
+            pygame.Rect(20, HEIGHT - (30 + 50 * 5), 50 * 5 + 10, 50 * 5 + 10),
+        )
+        regions.mark("worldmap", (worldmap.shown, worldmap.count, arena.player.rx, arena.player.ry), worldmap.rect)
+        regions.mark("cursor", (cursor.topleft, cursorImage), cursor)
+        if arena.transtimer or DEBUG:
+            regions.full()
+        regions.present()
+    else:
+        pygame.display.update()
+    if profiler: profiler.lap("display")
+
+    arena.prepareRooms()
+    clock.tick(RENDERRATE)
+    if profiler:
+        profiler.lap("idle")
+        profiler.commit()
\ No newline at end of file
@@ -0,0 +1,398 @@
+import math
+import itertools
+import pygame
+
+from collections import OrderedDict
+
+from static import *
+
+CHUNK = 1024
+BORDER = 4
+
+
+
+class Background:
+
+    def __init__(self, images : dict[str, pygame.Surface]):
+        self.images = images
+        self.room : Room | None = None
+        self.scale : int = 0
+        self.chunks : dict[tuple[int, int], pygame.Surface] = {}
+
+    def release(self):
+        self.room = None
+        self.chunks.clear()
+
+    def size(self) -> tuple[int, int]:
+        return (
+            self.room.w * self.scale + BORDER * 2,
+            self.room.h * self.scale + BORDER * 2,
+        )
+
+    def render(self, cx : int, cy : int) -> pygame.Surface:
+        room = self.room
+        scale = self.scale
+        width, height = self.size()
+        ox, oy = cx * CHUNK, cy * CHUNK
+
+        chunk = pygame.Surface(
+            (min(CHUNK, width - ox), min(CHUNK, height - oy))
+        ).convert()
+        chunk.fill("#030303")
+
+        def point(x : float, y : float) -> tuple[float, float]:
+            return (
+                (x + room.w / 2) * scale + BORDER - ox,
+                (y + room.h / 2) * scale + BORDER - oy,
+            )
+
+        img = self.images.get("tile_base")
+        for x in range(max(0, (ox - BORDER) // scale), min(room.w, (ox + CHUNK) // scale + 1)):
+            for y in range(max(0, (oy - BORDER) // scale), min(room.h, (oy + CHUNK) // scale + 1)):
+                chunk.blit(img, point(x - room.w / 2, y - room.h / 2))
+
+        img = self.images.get("tile_ceil")
+        for block in room.layout:
+            for dx in range(math.floor(block.w)):
+                for dy in range(math.floor(block.h)):
+                    chunk.blit(
+                        img, point(block.x + dx - block.w / 2, block.y + dy - block.h / 2)
+                    )
+
+            pygame.draw.rect(
+                chunk, "#FFFF00",
+                (
+                    *point(block.x - block.w / 2, block.y - block.h / 2),
+                    block.w * scale,
+                    block.h * scale,
+                ), 4,
+            )
+
+        pygame.draw.rect(
+            chunk, "#030303",
+            (
+                BORDER - 2 - ox,
+                BORDER - 2 - oy,
+                room.w * scale + 4,
+                room.h * scale + 4,
+            ), 8,
+        )
+
+        self.chunks[(cx, cy)] = chunk
+        return chunk
+
+    def draw(self, screen : pygame.Surface, room, scale : int, camX : float, camY : float):
+        if room is not self.room or scale != self.scale:
+            self.release()
+            self.room = room
+            self.scale = scale
+
+        left = (-room.w / 2 - camX) * scale + WIDTH // 2 - BORDER
+        top = (-room.h / 2 - camY) * scale + HEIGHT // 2 - BORDER
+        width, height = self.size()
+
+        for cx in range(max(0, math.floor(-left / CHUNK)), min(math.ceil(width / CHUNK), math.floor((WIDTH - left) / CHUNK) + 1)):
+            for cy in range(max(0, math.floor(-top / CHUNK)), min(math.ceil(height / CHUNK), math.floor((HEIGHT - top) / CHUNK) + 1)):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is None:
+                    chunk = self.render(cx, cy)
+                screen.blit(chunk, (left + cx * CHUNK, top + cy * CHUNK))
+
+
+
+class Sprites:
+
+    def __init__(self, images : dict[str, pygame.Surface], size : int = 1024, step : int = 2):
+        self.images = images
+        self.size = size
+        self.step = step
+        self.cache : OrderedDict[tuple[str, int, bool], pygame.Surface] = OrderedDict()
+
+    def get(self, key : str, angle : float = 0, flip : bool = False) -> pygame.Surface:
+        angle = round(angle / self.step) * self.step % 360
+        if angle == 0 and not flip:
+            return self.images.get(key)
+
+        index = (key, angle, flip)
+        img = self.cache.get(index)
+        if img is not None:
+            self.cache.move_to_end(index)
+            return img
+
+        img = self.images.get(key)
+        if flip:
+            img = pygame.transform.flip(img, 0, 1)
+        if angle != 0:
+            img = pygame.transform.rotate(img, angle)
+
+        self.cache[index] = img
+        if len(self.cache) > self.size:
+            self.cache.popitem(last = False)
+        return img
+
+
+
+def drawCell(surface : pygame.Surface, images : dict[str, pygame.Surface], room, bx : float, by : float, scale : float = 1.0):
+    # one minimap cell at 50 px per room times scale: the room icon and a stub per open entrance
+    img = images.get("map_null")
+    if room:
+        img = images.get(f"map_{room.type}", img)
+    if scale != 1.0:
+        img = pygame.transform.smoothscale(img, (round(img.get_width() * scale), round(img.get_height() * scale)))
+    surface.blit(img, (bx, by))
+
+    if not room: return
+    width = max(1, round(5 * scale))
+    mid, end, out = 20 * scale, 40 * scale, 5 * scale
+    if room.ew:
+        pygame.draw.line(surface, "#7F7F7F", (bx + mid, by), (bx + mid, by - out), width)
+    if room.es:
+        pygame.draw.line(surface, "#7F7F7F", (bx + mid, by + end), (bx + mid, by + end + out), width)
+    if room.ea:
+        pygame.draw.line(surface, "#7F7F7F", (bx, by + mid), (bx - out, by + mid), width)
+    if room.ed:
+        pygame.draw.line(surface, "#7F7F7F", (bx + end, by + mid), (bx + end + out, by + mid), width)
+
+
+
+class Minimap:
+
+    def __init__(self, images : dict[str, pygame.Surface], radius : int = 2, cell : int = 50, pad : int = 5):
+        self.images = images
+        self.radius = radius
+        self.cell = cell
+        self.pad = pad
+        size = (radius * 2 + 1) * cell + pad * 2
+        self.surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        self.key : tuple[int, int, int] | None = None
+
+    def render(self, arena : Arena) -> pygame.Surface:
+        # rooms are only ever added and never change type or entrances, so the room count is enough
+        key = (arena.player.rx, arena.player.ry, len(arena.rooms))
+        if key == self.key: return self.surface
+        self.key = key
+
+        self.surface.fill((0, 0, 0, 0))
+        for dx in range(-self.radius, self.radius + 1):
+            for dy in range(-self.radius, self.radius + 1):
+                drawCell(
+                    self.surface, self.images,
+                    arena.getRoomInfo(arena.player.rx + dx, arena.player.ry + dy),
+                    self.pad + (dx + self.radius) * self.cell,
+                    self.pad + (dy + self.radius) * self.cell,
+                )
+        return self.surface
+
+    def draw(self, screen : pygame.Surface, arena : Arena, x : int, y : int) -> pygame.Rect:
+        return screen.blit(self.render(arena), (x - self.pad, y - self.pad))
+
+
+
+class WorldMap:
+
+    def __init__(self, images : dict[str, pygame.Surface], cell : int = 12):
+        self.images = images
+        self.cell = cell
+        self.scale : float = cell / 50
+        self.surface : pygame.Surface | None = None
+        # room coordinates of the surface's top left cell, and the rooms drawn so far
+        self.left : int = 0
+        self.top : int = 0
+        self.count : int = 0
+        self.shown : bool = False
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+    def toggle(self):
+        self.shown = not self.shown
+
+    def update(self, arena : Arena):
+        if len(arena.rooms) == self.count: return
+        fresh = list(itertools.islice(arena.rooms.values(), self.count, None))
+        self.count = len(arena.rooms)
+
+        left = min(room.rx for room in fresh)
+        top = min(room.ry for room in fresh)
+        right = max(room.rx for room in fresh) + 1
+        bottom = max(room.ry for room in fresh) + 1
+        if self.surface is not None:
+            left, top = min(left, self.left), min(top, self.top)
+            right = max(right, self.left + self.surface.get_width() // self.cell)
+            bottom = max(bottom, self.top + self.surface.get_height() // self.cell)
+
+        size = ((right - left) * self.cell, (bottom - top) * self.cell)
+        if self.surface is None or size != self.surface.get_size():
+            surface = pygame.Surface(size, pygame.SRCALPHA)
+            if self.surface is not None:
+                surface.blit(self.surface, ((self.left - left) * self.cell, (self.top - top) * self.cell))
+            self.surface = surface
+            self.left, self.top = left, top
+
+        for room in fresh:
+            drawCell(
+                self.surface, self.images, room,
+                (room.rx - self.left) * self.cell + self.scale * 5,
+                (room.ry - self.top) * self.cell + self.scale * 5,
+                self.scale,
+            )
+
+    def draw(self, screen : pygame.Surface, arena : Arena) -> pygame.Rect | None:
+        if not self.shown: return None
+        self.update(arena)
+        if self.surface is None: return None
+
+        # centred on the screen, or on the player's room when larger than it
+        width, height = self.surface.get_size()
+        px = (arena.player.rx - self.left) * self.cell + self.cell // 2
+        py = (arena.player.ry - self.top) * self.cell + self.cell // 2
+        area = pygame.Rect(0, 0, min(width, WIDTH - 100), min(height, HEIGHT - 100))
+        area.center = (px, py)
+        area.clamp_ip(self.surface.get_rect())
+
+        self.rect = pygame.Rect(0, 0, area.w + 20, area.h + 20)
+        self.rect.center = (WIDTH // 2, HEIGHT // 2)
+        pygame.draw.rect(screen, "#030303", self.rect)
+        pygame.draw.rect(screen, "#7F7F7F", self.rect, 2)
+        screen.blit(self.surface, (self.rect.x + 10, self.rect.y + 10), area)
+        pygame.draw.rect(
+            screen, "#FFFFFF",
+            (self.rect.x + 10 + px - area.x - 2, self.rect.y + 10 + py - area.y - 2, 4, 4),
+        )
+        return self.rect
+
+
+
+class Hud:
+
+    def __init__(self, images : dict[str, pygame.Surface]):
+        self.images = images
+        self.hearts : pygame.Surface | None = None
+        self.ammo : pygame.Surface | None = None
+        self.key : tuple | None = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+    def strip(self, icons : list[pygame.Surface]) -> pygame.Surface | None:
+        if not icons: return None
+        surface = pygame.Surface(
+            (sum(icon.get_width() for icon in icons), max(icon.get_height() for icon in icons)),
+            pygame.SRCALPHA,
+        )
+        x = 0
+        for icon in icons:
+            surface.blit(icon, (x, 0))
+            x += icon.get_width()
+        return surface
+
+    def render(self, arena : Arena):
+        player = arena.player
+        item = player.item
+        shooter = item is not None and item.type == "SHOOTER"
+        key = (
+            player.hp,
+            item.id if shooter else None,
+            item.ammo if shooter else None,
+            item.max_ammo if shooter else None,
+        )
+        if key == self.key: return
+        hp = key[0]
+        if self.key is None or hp != self.key[0]:
+            self.hearts = self.strip([self.images.get("heart_icon")] * max(0, hp))
+        if self.key is None or key[1:] != self.key[1:]:
+            self.ammo = self.strip([
+                self.images.get("bullet_icon") if i < item.ammo else self.images.get("bullet_used_icon")
+                for i in range(item.max_ammo)
+            ]) if shooter else None
+        self.key = key
+
+    def draw(self, screen : pygame.Surface, arena : Arena) -> pygame.Rect:
+        self.render(arena)
+        heart = self.images.get("heart_icon")
+        self.rect = pygame.Rect(WIDTH // 2, HEIGHT - 20, 0, 0)
+        if self.hearts:
+            self.rect.union_ip(screen.blit(
+                self.hearts, (
+                    WIDTH // 2 - self.hearts.get_width() // 2,
+                    HEIGHT - 20 - heart.get_height(),
+                )
+            ))
+        if self.ammo:
+            self.rect.union_ip(screen.blit(
+                self.ammo, (
+                    WIDTH // 2 - self.ammo.get_width() // 2,
+                    HEIGHT - 40 - heart.get_height() - self.ammo.get_height(),
+                )
+            ))
+        return self.rect
+
+
+
+class Overlay:
+
+    def __init__(self, size : int = 22):
+        self.font = pygame.font.Font(None, size)
+
+    def lines(self, profiler : Profiler, room) -> list[str]:
+        lines = [
+            f"frame {profiler.frame:6.2f} ms",
+        ]
+        for name, ms in profiler.sections.items():
+            lines.append(f"  {name:<12}{ms:6.2f} ms")
+
+        lines.append("entities")
+        for _id, ms in sorted(profiler.costs.items(), key = lambda cost: -cost[1]):
+            count = profiler.counts.get(_id, 0)
+            if ms < 0.005 and not count: continue
+            lines.append(f"  tick_{_id:<18}{ms:6.2f} ms  x{count}")
+
+        if room:
+            lines.append(
+                f"{len(room.entities)} entities  {len(room.particles)} particles  {len(room.light)} lights"
+            )
+        return lines
+
+    def draw(self, screen : pygame.Surface, profiler : Profiler, room):
+        y = 10
+        for line in self.lines(profiler, room):
+            text = self.font.render(line, True, "#FFFFFF", "#000000")
+            screen.blit(text, (10, y))
+            y += text.get_height()
+
+
+
+class Regions:
+
+    def __init__(self, size : tuple[int, int]):
+        self.screen = pygame.Rect((0, 0), size)
+        self.signatures : dict[str, object] = {}
+        self.areas : dict[str, pygame.Rect] = {}
+        self.rects : list[pygame.Rect] = []
+        self.everything : bool = True
+
+    def mark(self, name : str, signature, rect : pygame.Rect):
+        # a region is presented when its signature or rect changed, along with
+        # the rect it covered before so whatever moved away gets cleared
+        rect = rect.clip(self.screen)
+        last = self.areas.get(name)
+        if self.signatures.get(name, self) == signature and last == rect: return
+        self.signatures[name] = signature
+        self.areas[name] = rect
+        if last is None or last == rect:
+            self.rects.append(rect)
+        elif last.colliderect(rect):
+            self.rects.append(rect.union(last))
+        else:
+            self.rects.append(rect)
+            self.rects.append(last)
+
+    def full(self):
+        self.everything = True
+
+    def present(self):
+        # past the screen's own area one full update is cheaper than many overlapping ones
+        if sum(rect.w * rect.h for rect in self.rects) >= self.screen.w * self.screen.h:
+            self.everything = True
+        if self.everything:
+            pygame.display.update()
+        elif self.rects:
+            pygame.display.update(self.rects)
+        self.rects.clear()
+        self.everything = False
@@ -0,0 +1,158 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+# Binary save layout, all little endian:
+#   MAGIC
+#   u32 header length, header JSON (player fields and the room type names)
+#   u32 room count, then per room: i32 rx, i32 ry, u64 offset, u8 type index, u8 entrance bits
+#   room records at their offsets: u32 length, zlib compressed JSON
+
+
+
+MAGIC = b"ARENASV1"
+LENGTH = struct.Struct("<I")
+ENTRY = struct.Struct("<iiQBB")
+
+
+
+def isBinary(path : str) -> bool:
+    try:
+        with open(path, "rb") as source:
+            return source.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def packEntrances(entrances) -> int:
+    bits = 0
+    for i, entrance in enumerate(entrances):
+        if entrance:
+            bits |= 1 << i
+    return bits
+
+def unpackEntrances(bits : int) -> list[bool]:
+    return [bool(bits >> i & 1) for i in range(4)]
+
+def encodeRoom(roomData : dict) -> bytes:
+    return zlib.compress(json.dumps(roomData, separators = (",", ":")).encode())
+
+def decodeRoom(record : bytes) -> dict:
+    return json.loads(zlib.decompress(record))
+
+def writeSave(target, header : dict, rooms : list[tuple[int, int, str, list, bytes]]):
+    types : list[str] = []
+    for room in rooms:
+        if not room[2] in types:
+            types.append(room[2])
+
+    text = json.dumps({**header, "types": types}).encode()
+    offset = len(MAGIC) + LENGTH.size + len(text) + LENGTH.size + ENTRY.size * len(rooms)
+
+    target.write(MAGIC)
+    target.write(LENGTH.pack(len(text)))
+    target.write(text)
+    target.write(LENGTH.pack(len(rooms)))
+    for rx, ry, _type, entrances, record in rooms:
+        target.write(ENTRY.pack(rx, ry, offset, types.index(_type), packEntrances(entrances)))
+        offset += LENGTH.size + len(record)
+    for room in rooms:
+        target.write(LENGTH.pack(len(room[4])))
+        target.write(room[4])
+
+
+
+class SaveFile:
+
+    def __init__(self, path : str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.open()
+
+    def open(self):
+        self.file = open(self.path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a binary save")
+
+        at = len(MAGIC)
+        size, = LENGTH.unpack_from(self.map, at)
+        at += LENGTH.size
+        self.header : dict = json.loads(self.map[at:at + size])
+        self.types : list[str] = self.header.pop("types")
+        at += size
+
+        count, = LENGTH.unpack_from(self.map, at)
+        at += LENGTH.size
+        self.index : dict[tuple[int, int], tuple[int, str, list[bool]]] = {}
+        for i in range(count):
+            rx, ry, offset, _type, bits = ENTRY.unpack_from(self.map, at)
+            self.index[(rx, ry)] = (offset, self.types[_type], unpackEntrances(bits))
+            at += ENTRY.size
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def record(self, rx : int, ry : int) -> bytes:
+        with self.lock:
+            offset = self.index[(rx, ry)][0]
+            size, = LENGTH.unpack_from(self.map, offset)
+            return self.map[offset + LENGTH.size:offset + LENGTH.size + size]
+
+    def room(self, rx : int, ry : int) -> dict:
+        return decodeRoom(self.record(rx, ry))
+
+    def replace(self, temp : str):
+        with self.lock:
+            self.close()
+            try:
+                os.replace(temp, self.path)
+            finally:
+                self.open()
+
+
+
+def toBinary(source : str, target : str):
+    with open(source, "r") as savefile:
+        save = json.load(savefile)
+    header = {key: value for key, value in save.items() if key != "rooms"}
+    rooms = []
+    seen = set()
+    for roomData in save.get("rooms", []):
+        key = (roomData.get("rx"), roomData.get("ry"))
+        if key in seen: continue
+        seen.add(key)
+        rooms.append((*key, roomData.get("type"), roomData.get("entrances"), encodeRoom(roomData)))
+    with open(target, "wb") as savefile:
+        writeSave(savefile, header, rooms)
+
+def toJson(source : str, target : str):
+    savefile = SaveFile(source)
+    save = {
+        **savefile.header,
+        "rooms": [
+            savefile.room(rx, ry) for rx, ry in savefile.index
+        ]
+    }
+    savefile.close()
+    with open(target, "w") as output:
+        json.dump(save, output)
+
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Convert saves between the JSON and binary formats.")
+    parser.add_argument("source", help = "save file to read")
+    parser.add_argument("target", help = "save file to write")
+    args = parser.parse_args()
+
+    if isBinary(args.source):
+        toJson(args.source, args.target)
+    else:
+        toBinary(args.source, args.target)
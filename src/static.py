@@ -1,6 +1,17 @@
 import math
 import random
+import bisect
+import itertools
 import json
+import time
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import numpy
+
+from savefile import *
 
 WIDTH = 1920
 HEIGHT = 1080
@@ -18,21 +29,94 @@ with open("src/grandom.json", "r") as source:
     RANDOMDATA = json.load(source)
     source.close()
 
+REACH = max(
+    (data.get("w", 0.75) + data.get("h", 0.75)) / 2 for data in ENTITYDATA.values()
+)
 
+PARTICLES : list[str] = []
+PARTICLEINDEX : dict[str, int] = {}
 
-def rollGeneration(rolldata : list[dict]) -> str:
-    pool = []
-    for roll in rolldata:
-        pool.extend([roll.get("id", "???")] * roll.get("rolls", 1))
-    return random.choice(pool)
+
+HOOKS : dict[tuple[type, str], dict] = {}
+
+def resolveHooks(cls : type, _id : str, names : tuple[str, ...]) -> dict:
+    hooks = HOOKS.get((cls, _id))
+    if hooks is None:
+        hooks = HOOKS[(cls, _id)] = {
+            name : getattr(cls, f"{name}_{_id}", getattr(cls, f"{name}_null")) for name in names
+        }
+    return hooks
+
+# meta keys of the save format and the Entity field each one is stored in
+METAFIELDS : dict[str, str] = {
+    "angle": "angle",
+    "velocity": "velocity",
+    "duration": "duration",
+    "cooldown": "cooldown",
+    "timer": "fuse",
+    "base": "base",
+    "opened": "opened",
+    "item_id": "item_id",
+}
+
+NEIGHBOURS : tuple[tuple[int, int], ...] = ((0, -1), (-1, 0), (0, 1), (1, 0))
+
+PROJECTILE = {"angle": 0, "velocity": 0.15, "duration": FRAMERATE // 4}
+
+# per-type meta defaults, filled in when an entity is created
+ENTITYSTATE : dict[str, dict] = {
+    "spider": {"cooldown": 0},
+    "explosive_spider": {"timer": 0},
+    "bullet": PROJECTILE,
+    "dagger": PROJECTILE,
+    "web": PROJECTILE,
+    "flameball": PROJECTILE,
+    "rocket": PROJECTILE,
+    "aura_wisp": {"angle": 0},
+    "methane_can": {"timer": 0},
+    "dungeon_chest": {"opened": False},
+    "grenade": {"timer": FRAMERATE * 3},
+    "turret": {"angle": 0, "timer": 0},
+}
+
+class RollTable:
+
+    def __init__(self, rolldata : list[dict]):
+        self.ids : list[str] = [roll.get("id", "???") for roll in rolldata]
+        self.bounds : list[int] = list(itertools.accumulate(roll.get("rolls", 1) for roll in rolldata))
+        self.total : int = self.bounds[-1] if self.bounds else 0
+        self.names = numpy.array(self.ids)
+        self.edges = numpy.array(self.bounds)
+
+    def roll(self, rng = random) -> str:
+        # randrange(total) draws what choice() over the expanded pool would, so seeded rooms stay the same
+        return self.ids[bisect.bisect_right(self.bounds, rng.randrange(self.total))]
+
+    def rollMany(self, amount : int, rng : numpy.random.Generator | None = None) -> numpy.ndarray:
+        if rng is None:
+            rng = numpy.random.default_rng(random.getrandbits(64))
+        return self.names[numpy.searchsorted(self.edges, rng.integers(0, self.total, amount), side = "right")]
+
+ROLLTABLES : dict[str, dict[str, RollTable]] = {
+    group : {name : RollTable(rolldata) for name, rolldata in tables.items()} for group, tables in RANDOMDATA.items()
+}
 
 
 
 class Arena:
 
-    def __init__(self, save : str):
+    def __init__(self, save : str | None, data : dict | None = None):
         self.path = save
-        self.save : dict = json.load(open(self.path))
+        self.source : SaveFile | None = None
+        if data is not None:
+            self.save : dict = data
+        elif self.path is not None and isBinary(self.path):
+            self.source = SaveFile(self.path)
+            self.save : dict = self.source.header
+        elif self.path is not None:
+            self.save : dict = json.load(open(self.path))
+        else:
+            self.save : dict = {}
 
         self.player = Player(
             self,
@@ -43,10 +127,39 @@ class Arena:
             self.loadItem(self.save.get("item", None)),
         )
         self.camera = Camera(self.player)
-
-        self.rooms = [
-            self.loadRoom(room) for room in self.save.get("rooms", [])
-        ]
+        self.camera.snap()
+
+        self.seed : int = self.save.get("seed")
+        if self.seed is None:
+            self.seed = random.getrandbits(32)
+
+        # rooms changed since the last save, and the encoded records of the rest
+        self.dirty : set[tuple[int, int]] = set()
+        self.saver = Saver(self.source, self.compactRoom, self.dirty)
+        # ticks between background saves, off unless the caller opts in
+        self.autosave : int = 0
+        self.autosaveTimer : int = 0
+
+        # rooms from the save stay as stubs until something needs their contents; a JSON
+        # save's records are held once, by the saver, and the parsed save is let go
+        self.rooms : dict[tuple[int, int], Room | RoomStub] = {}
+        for roomData in self.save.get("rooms", []):
+            key = (roomData.get("rx"), roomData.get("ry"))
+            if key in self.rooms: continue
+            self.rooms[key] = RoomStub(*key, roomData.get("type"), roomData.get("entrances"))
+            self.saver.fragments[key] = roomData
+        self.save = {key: value for key, value in self.save.items() if key != "rooms"}
+        if self.source is not None:
+            for key, (offset, _type, entrances) in self.source.index.items():
+                self.rooms[key] = RoomStub(*key, _type, entrances)
+
+        # materialized rooms from least to most recently entered; rooms within
+        # neighbourhood of the player stay loaded, the rest past capacity go back to stubs
+        self.residency : OrderedDict[tuple[int, int], None] = OrderedDict()
+        self.capacity : int = 64
+        self.neighbourhood : int = 1
+
+        self.current : Room | None = self.getRoom(self.player.rx, self.player.ry)
 
         self.scale : int = 75
 
@@ -54,22 +167,56 @@ class Arena:
         self.transdir : int = 0
         self.transtimer : int = 0
 
+        self.profiler : Profiler | None = None
+
+        # ticks run so far; loaded rooms next to the player take turns ticking once
+        # every len(NEIGHBOURS) ticks, rooms further out are suspended
+        self.steps : int = 0
+        # whether the last tick moved the rooms; frozen ticks leave entities and
+        # particles where they are, so there is nothing to interpolate towards
+        self.stepped : bool = False
+
+        # rooms behind the current room's entrances, generated ahead on a worker
+        self.executor : ThreadPoolExecutor | None = None
+        self.pending : dict[tuple[int, int], Future] = {}
+
         # self.interacted : bool = False #
 
     def saveGame(self):
-        with open(self.path, "w") as savefile:
-            json.dump(self.getSave(), savefile)
-            savefile.close()
-
-    def getSave(self) -> dict:
+        if self.path is None: return
+        self.saver.wait()
+        self.saver.write(self.path, *self.snapshot())
+        self.releaseRooms()
+
+    def autosaveGame(self):
+        if self.path is None: return
+        if self.saver.busy(): return
+        self.saver.start(self.path, *self.snapshot())
+
+    def snapshot(self) -> tuple[dict, dict, list]:
+        changed = {}
+        for key in self.dirty:
+            room = self.rooms.get(key)
+            if room:
+                changed[key] = self.saveRoom(room)
+        self.dirty.clear()
+        return self.getHeader(), changed, list(self.rooms)
+
+    def getHeader(self) -> dict:
         return {
             "x": self.player.x,
             "y": self.player.y,
             "rx": self.player.rx,
             "ry": self.player.ry,
             "item": self.saveItem(self.player.item),
+            "seed": self.seed,
+        }
+
+    def getSave(self) -> dict:
+        return {
+            **self.getHeader(),
             "rooms": [
-                self.saveRoom(room) for room in self.rooms
+                self.compactRoom(self.saveRoom(room)) for room in self.rooms.values()
             ]
         }
 
@@ -88,6 +235,7 @@ class Arena:
         }
 
     def loadRoom(self, roomData : dict):
+        if roomData.get("seeded"): return self.loadSeededRoom(roomData)
         room = Room(
             self,
             roomData.get("rx"),
@@ -99,14 +247,65 @@ class Arena:
             ],
             [
                 self.loadEntity(entity) for entity in roomData.get("entities", [])
-            ], [],
+            ],
             roomData.get("type"),
             roomData.get("entrances"),
         )
         return room
 
+    def loadSeededRoom(self, roomData : dict):
+        rx, ry = roomData.get("rx"), roomData.get("ry")
+        entrances = roomData.get("entrances")
+        base = self.generateRoom(rx, ry, None, entrances)
+
+        entities = []
+        if "entities" in roomData:
+            # an evicted room still holding its saveRoom snapshot
+            for origin, entityData in roomData.get("entities"):
+                entity = self.loadEntity(entityData)
+                entity.origin = origin
+                entities.append(entity)
+        else:
+            removed = set(roomData.get("removed", []))
+            changed = roomData.get("changed", {})
+            for entity in base.entities:
+                if entity.origin in removed: continue
+                entityData = changed.get(str(entity.origin))
+                if entityData is not None:
+                    origin = entity.origin
+                    entity = self.loadEntity(entityData)
+                    entity.origin = origin
+                entities.append(entity)
+            for entityData in roomData.get("added", []):
+                entities.append(self.loadEntity(entityData))
+
+        room = Room(
+            self,
+            rx, ry,
+            base.w, base.h,
+            base.layout,
+            entities,
+            base.type,
+            entrances,
+        )
+        room.seeded = True
+        return room
+
     def saveRoom(self, room):
+        if isinstance(room, RoomStub): return self.stubData(room)
         if not isinstance(room, Room): return
+        if room.seeded:
+            # compactRoom turns this into differences against the generated room
+            return {
+                "rx": room.rx,
+                "ry": room.ry,
+                "type": room.type,
+                "entrances": [room.ew, room.ea, room.es, room.ed],
+                "seeded": True,
+                "entities": [
+                    (entity.origin, self.saveEntity(entity)) for entity in room.entities
+                ],
+            }
         return {
             "rx": room.rx,
             "ry": room.ry,
@@ -122,6 +321,34 @@ class Arena:
             "entrances": [room.ew, room.ea, room.es, room.ed],
         }
 
+    def compactRoom(self, roomData : dict) -> dict:
+        if not roomData.get("seeded") or not "entities" in roomData: return roomData
+        rx, ry = roomData.get("rx"), roomData.get("ry")
+        base = self.generateRoom(rx, ry, None, roomData.get("entrances"))
+        baseline = [self.saveEntity(entity) for entity in base.entities]
+
+        removed = set(range(len(baseline)))
+        changed = {}
+        added = []
+        for origin, entityData in roomData.get("entities"):
+            if origin is None:
+                added.append(entityData)
+                continue
+            removed.discard(origin)
+            if entityData != baseline[origin]:
+                changed[str(origin)] = entityData
+
+        return {
+            "rx": rx,
+            "ry": ry,
+            "type": roomData.get("type"),
+            "entrances": roomData.get("entrances"),
+            "seeded": True,
+            "removed": sorted(removed),
+            "changed": changed,
+            "added": added,
+        }
+
     def loadBlock(self, blockData : dict):
         block = Block(
             self,
@@ -163,20 +390,60 @@ class Arena:
 
 
     def getRoom(self, rx : int, ry : int):
-        for room in self.rooms:
-            if (rx, ry) == (room.rx, room.ry):
-                return room
-        return None
+        room = self.rooms.get((rx, ry))
+        if isinstance(room, RoomStub):
+            room = self.rooms[(rx, ry)] = self.loadRoom(self.stubData(room))
+            self.residency[(rx, ry)] = None
+        return room
+
+    def stubData(self, stub) -> dict:
+        if stub.data is not None: return stub.data
+        return self.saver.record(stub.rx, stub.ry)
+
+    def getRoomInfo(self, rx : int, ry : int):
+        return self.rooms.get((rx, ry))
+
+    def enterRoom(self, rx : int, ry : int):
+        self.player.rx, self.player.ry = rx, ry
+        self.newRoom(rx, ry)
+        self.current = self.getRoom(rx, ry)
+        self.residency[(rx, ry)] = None
+        self.residency.move_to_end((rx, ry))
+        self.evictRooms()
+        return self.current
+
+    def evictRooms(self):
+        for key in list(self.residency):
+            if len(self.residency) <= self.capacity: break
+            if max(abs(key[0] - self.player.rx), abs(key[1] - self.player.ry)) <= self.neighbourhood: continue
+            self.evictRoom(key)
+
+    def evictRoom(self, key : tuple[int, int]):
+        self.residency.pop(key, None)
+        room = self.rooms.get(key)
+        if not isinstance(room, Room): return
+        if self.saver.holds(key) and not key in self.dirty and not self.saver.busy():
+            # the saver already has it as it is
+            data = None
+        else:
+            # held until the next save writes it, see releaseRooms
+            data = self.compactRoom(self.saveRoom(room))
+        self.rooms[key] = RoomStub(*key, room.type, [room.ew, room.ea, room.es, room.ed], data)
+
+    def releaseRooms(self):
+        # stubs written by the last save and untouched since read their record back from the saver
+        if self.saver.busy(): return
+        for key in self.saver.written:
+            room = self.rooms.get(key)
+            if isinstance(room, RoomStub) and not key in self.dirty:
+                room.data = None
+        self.saver.written.clear()
 
     def flash(self, x : float, y : float, force : int = 12, duration : int = 30):
-        self.player.getRoom().light.append(Light(x, y, force, duration))
+        self.player.getRoom().flash(x, y, force, duration)
 
     def newEntity(self, _id : str, x : float, y : float, **meta : int | float | str):
-        entity = Entity(
-            self, _id, x, y, **meta,
-        )
-        self.player.getRoom().entities.append(entity)
-        return entity
+        return self.player.getRoom().newEntity(_id, x, y, **meta)
 
     def newParticle(
         self,
@@ -189,24 +456,42 @@ class Arena:
         ax : float = 0.0,
         ay : float = 0.0,
     ):
-        particle = Particle(_id, x, y, vx, vy, t, ax, ay)
-        self.player.getRoom().particles.append(particle)
-        return particle
+        return self.player.getRoom().newParticle(_id, x, y, vx, vy, t, ax, ay)
+
+    def newParticles(
+        self,
+        _id : str,
+        x : float,
+        y : float,
+        vx : numpy.ndarray,
+        vy : numpy.ndarray,
+        t : int,
+    ):
+        return self.player.getRoom().newParticles(_id, x, y, vx, vy, t)
+
+    def pick(self, point : tuple[float, float]):
+        distance = math.sqrt((self.player.x - point[0]) ** 2 + (self.player.y - point[1]) ** 2)
+        if distance > 7: return None
+        for entity in self.player.getRoom().flags["interactable"]:
+            if entity.x - entity.w / 2 <= point[0] <= entity.x + entity.w / 2:
+                if entity.y - entity.h / 2 <= point[1] <= entity.y + entity.h / 2:
+                    return entity
+        return None
+
+    def interact(self, point : tuple[float, float]):
+        entity = self.pick(point)
+        if entity:
+            entity.interact()
+        return entity
 
     def freeze(self, duration : int):
         self.frozen += duration
 
     def countOpponents(self) -> int:
-        count = 0
-        for entity in self.player.getRoom().entities:
-            if entity.opponent: count += 1
-        return count
+        return self.player.getRoom().countOpponents()
 
     def countEntity(self, _id : str) -> int:
-        count = 0
-        for entity in self.player.getRoom().entities:
-            if entity.id == _id: count += 1
-        return count
+        return self.player.getRoom().countEntity(_id)
 
     def tick(self):
 
@@ -218,41 +503,38 @@ class Arena:
                 match self.transdir:
 
                     case 3:
-                        self.player.rx -= 1
-                        self.newRoom(self.player.rx, self.player.ry)
+                        self.enterRoom(self.player.rx - 1, self.player.ry)
                         self.player.x = self.player.getRoom().w / 2 - 1
                         self.player.y = 0
 
                     case 1:
-                        self.player.rx += 1
-                        self.newRoom(self.player.rx, self.player.ry)
+                        self.enterRoom(self.player.rx + 1, self.player.ry)
                         self.player.x = -self.player.getRoom().w / 2 + 1
                         self.player.y = 1
 
                     case 0:
-                        self.player.ry -= 1
-                        self.newRoom(self.player.rx, self.player.ry)
+                        self.enterRoom(self.player.rx, self.player.ry - 1)
                         self.player.x = 0
                         self.player.y = self.player.getRoom().h / 2 - 1
 
                     case 2:
-                        self.player.ry += 1
-                        self.newRoom(self.player.rx, self.player.ry)
+                        self.enterRoom(self.player.rx, self.player.ry + 1)
                         self.player.x = 0
                         self.player.y = -self.player.getRoom().h / 2 + 1
 
-                for entity in self.player.getRoom().entities:
-                    if entity.temporary:
-                        entity.destroy = True
+                for entity in self.player.getRoom().flags["temporary"]:
+                    entity.destroy = True
 
                 self.player.getRoom().light.clear()
                 self.player.getRoom().particles.clear()
+                self.camera.snap()
 
-        if not self.player.getRoom():
-            self.newRoom(self.player.rx, self.player.ry)
+        if not self.current:
+            self.enterRoom(self.player.rx, self.player.ry)
 
         if self.frozen:
             self.frozen -= 1
+            self.stepped = False
             self.camera.tick()
             return
 
@@ -285,31 +567,112 @@ class Arena:
         self.player.getRoom().tick()
         self.camera.tick()
 
+        self.tickNeighbours()
+        self.steps += 1
+        self.stepped = True
 
+        if self.saver.written:
+            self.releaseRooms()
+
+        if self.autosave:
+            self.autosaveTimer += 1
+            if self.autosaveTimer >= self.autosave:
+                self.autosaveTimer = 0
+                self.autosaveGame()
+
+
+
+    def tickNeighbours(self):
+        dx, dy = NEIGHBOURS[self.steps % len(NEIGHBOURS)]
+        room = self.getRoomInfo(self.player.rx + dx, self.player.ry + dy)
+        if isinstance(room, Room):
+            room.tick()
 
     def newRoom(self, rx : int, ry : int):
-        gen = self.generateRoom(rx, ry)
-        self.rooms.append(gen)
+        if (rx, ry) in self.rooms: return
+        gen = None
+        future = self.pending.pop((rx, ry), None)
+        if future is not None and not future.cancelled():
+            gen = future.result()
+            if not self.fits(gen):
+                gen = None
+        if gen is None:
+            gen = self.generateRoom(rx, ry)
+        self.rooms[(rx, ry)] = gen
+        self.residency[(rx, ry)] = None
+        self.dirty.add((rx, ry))
         return
 
-    def generateRoom(self, rx : int, ry : int):
+    def prepareRooms(self):
+        room = self.current
+        if not room: return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers = 1)
+
+        wanted = []
+        for dx, dy, entrance in ((0, -1, room.ew), (-1, 0, room.ea), (0, 1, room.es), (1, 0, room.ed)):
+            key = (room.rx + dx, room.ry + dy)
+            if entrance and not key in self.rooms:
+                wanted.append(key)
+
+        for key in list(self.pending):
+            if not key in wanted:
+                self.pending.pop(key).cancel()
+
+        for key in wanted:
+            if not key in self.pending:
+                self.pending[key] = self.executor.submit(self.generateRoom, *key)
+
+    def fits(self, room) -> bool:
+        # neighbours created after the room was generated may disagree on shared entrances
+        for dx, dy, entrance, facing in ((0, -1, "ew", "es"), (-1, 0, "ea", "ed"), (0, 1, "es", "ew"), (1, 0, "ed", "ea")):
+            find = self.getRoomInfo(room.rx + dx, room.ry + dy)
+            if find and getattr(find, facing) != getattr(room, entrance):
+                return False
+        return True
+
+    def roomRandom(self, rx : int, ry : int) -> random.Random:
+        return random.Random(f"{self.seed}:{rx}:{ry}")
+
+    def rollEntrances(self, rx : int, ry : int) -> list[bool]:
+        # each entrance belongs to the edge between two rooms, so either side rolls the same
+        entrances = []
+        for dx, dy, facing, edge in ((0, -1, "es", (rx, ry, 0)), (-1, 0, "ed", (rx, ry, 1)), (0, 1, "ew", (rx, ry + 1, 0)), (1, 0, "ea", (rx + 1, ry, 1))):
+            find = self.getRoomInfo(rx + dx, ry + dy)
+            if find:
+                entrances.append(getattr(find, facing))
+            else:
+                entrances.append(random.Random(f"{self.seed}:{edge[0]}:{edge[1]}:{edge[2]}").randint(1, 3) != 1)
+        return entrances
+
+    def generateRoom(self, rx : int, ry : int, rng : random.Random | None = None, entrances : list[bool] | None = None):
 
-        chance = random.randint(1, 100)
+        if rng is None:
+            rng = self.roomRandom(rx, ry)
+
+        chance = rng.randint(1, 100)
 
         if chance <= 75:
-            room = self.generateRoomPassage(rx, ry)
+            room = self.generateRoomPassage(rx, ry, rng, entrances)
         else:
-            room = self.generateRoomDungeon(rx, ry)
+            room = self.generateRoomDungeon(rx, ry, rng, entrances)
+
+        room.seeded = True
+        for origin, entity in enumerate(room.entities):
+            entity.origin = origin
 
         return room
 
-    def generateRoomPassage(self, rx : int, ry : int):
+    def generateRoomPassage(self, rx : int, ry : int, rng : random.Random | None = None, entrances : list[bool] | None = None):
+
+        if rng is None:
+            rng = self.roomRandom(rx, ry)
 
         room = Room(
             self,
             rx, ry,
             20, 20,
-            [], [], [],
+            [], [],
             "passage",
         )
 
@@ -323,42 +686,7 @@ class Arena:
         #         froom = self.getRoom(rx + dx, ry + dy)
         #         if not froom:
 
-        find = self.getRoom(rx, ry - 1)
-        if find:
-            # print(f"ROOM {rx} {ry - 1} FOUND : room.ew = {find.es}") #
-            room.ew = find.es
-        else:
-            if random.randint(1, 3) == 1:
-                room.ew = False
-            else:
-                room.ew = True
-
-        find = self.getRoom(rx - 1, ry)
-        if find:
-            room.ea = find.ed
-        else:
-            if random.randint(1, 3) == 1:
-                room.ea = False
-            else:
-                room.ea = True
-
-        find = self.getRoom(rx, ry + 1)
-        if find:
-            room.es = find.ew
-        else:
-            if random.randint(1, 3) == 1:
-                room.es = False
-            else:
-                room.es = True
-
-        find = self.getRoom(rx + 1, ry)
-        if find:
-            room.ed = find.ea
-        else:
-            if random.randint(1, 3) == 1:
-                room.ed = False
-            else:
-                room.ed = True
+        room.ew, room.ea, room.es, room.ed = entrances or self.rollEntrances(rx, ry)
 
 
         if room.ew:
@@ -386,30 +714,34 @@ class Arena:
             room.layout.append(Block(self, 8, 0, 4, 12))
 
 
-        if random.randint(1, 3) == 1:
+        if rng.randint(1, 3) == 1:
             room.layout.append(Block(self, 0, 0, 3, 3))
 
-        if random.randint(1, 2) == 1:
-            items = random.randint(1, 3)
+        if rng.randint(1, 2) == 1:
+            items = rng.randint(1, 3)
             for i in range(items):
-                ix = random.randint(2, 5) * random.choice((1, -1))
-                iy = random.randint(2, 5) * random.choice((1, -1))
-                iid = rollGeneration(RANDOMDATA.get("loot").get("ground"))
-                room.entities.append(Entity(
+                ix = rng.randint(2, 5) * rng.choice((1, -1))
+                iy = rng.randint(2, 5) * rng.choice((1, -1))
+                iid = ROLLTABLES["loot"]["ground"].roll(rng)
+                room.addEntity(Entity(
                     self, "item", ix, iy, item_id = iid,
                 ))
 
+        room.bake()
 
         return room
 
 
-    def generateRoomDungeon(self, rx : int, ry : int):
+    def generateRoomDungeon(self, rx : int, ry : int, rng : random.Random | None = None, entrances : list[bool] | None = None):
+
+        if rng is None:
+            rng = self.roomRandom(rx, ry)
 
         room = Room(
             self,
             rx, ry,
             30, 30,
-            [], [], [],
+            [], [],
             "dungeon",
         )
 
@@ -418,77 +750,42 @@ class Arena:
         room.layout.append(Block(self, -13, 13, 4, 4))
         room.layout.append(Block(self, 13, 13, 4, 4))
 
-        find = self.getRoom(rx, ry - 1)
-        if find:
-            # print(f"ROOM {rx} {ry - 1} FOUND : room.ew = {find.es}") #
-            room.ew = find.es
-        else:
-            if random.randint(1, 3) == 1:
-                room.ew = False
-            else:
-                room.ew = True
-
-        find = self.getRoom(rx - 1, ry)
-        if find:
-            room.ea = find.ed
-        else:
-            if random.randint(1, 3) == 1:
-                room.ea = False
-            else:
-                room.ea = True
-
-        find = self.getRoom(rx, ry + 1)
-        if find:
-            room.es = find.ew
-        else:
-            if random.randint(1, 3) == 1:
-                room.es = False
-            else:
-                room.es = True
-
-        find = self.getRoom(rx + 1, ry)
-        if find:
-            room.ed = find.ea
-        else:
-            if random.randint(1, 3) == 1:
-                room.ed = False
-            else:
-                room.ed = True
+        room.ew, room.ea, room.es, room.ed = entrances or self.rollEntrances(rx, ry)
 
 
         if room.ew:
             room.layout.append(Block(self, -6, -13, 10, 4))
             room.layout.append(Block(self, 6, -13, 10, 4))
-            room.entities.append(Entity(self, "barricade", -0.5, -room.h / 2))
-            room.entities.append(Entity(self, "barricade", 0, -room.h / 2))
-            room.entities.append(Entity(self, "barricade", 0.5, -room.h / 2))
+            room.addEntity(Entity(self, "barricade", -0.5, -room.h / 2))
+            room.addEntity(Entity(self, "barricade", 0, -room.h / 2))
+            room.addEntity(Entity(self, "barricade", 0.5, -room.h / 2))
         else:
             room.layout.append(Block(self, 0, -13, 22, 4))
 
         if room.es:
             room.layout.append(Block(self, -6, 13, 10, 4))
             room.layout.append(Block(self, 6, 13, 10, 4))
-            room.entities.append(Entity(self, "barricade", -0.5, room.h / 2))
-            room.entities.append(Entity(self, "barricade", 0, room.h / 2))
-            room.entities.append(Entity(self, "barricade", 0.5, room.h / 2))
+            room.addEntity(Entity(self, "barricade", -0.5, room.h / 2))
+            room.addEntity(Entity(self, "barricade", 0, room.h / 2))
+            room.addEntity(Entity(self, "barricade", 0.5, room.h / 2))
         else:
             room.layout.append(Block(self, 0, 13, 22, 4))
 
         if room.ea:
             room.layout.append(Block(self, -13, -6, 4, 10))
             room.layout.append(Block(self, -13, 6, 4, 10))
-            room.entities.append(Entity(self, "barricade", -room.w / 2, -0.5))
-            room.entities.append(Entity(self, "barricade", -room.w / 2, 0))
-            room.entities.append(Entity(self, "barricade", -room.w / 2, 0.5))
+            room.addEntity(Entity(self, "barricade", -room.w / 2, -0.5))
+            room.addEntity(Entity(self, "barricade", -room.w / 2, 0))
+            room.addEntity(Entity(self, "barricade", -room.w / 2, 0.5))
         else:
             room.layout.append(Block(self, -13, 0, 4, 22))
 
         if room.ed:
             room.layout.append(Block(self, 13, -6, 4, 10))
             room.layout.append(Block(self, 13, 6, 4, 10))
-            room.entities.append(Entity(self, "barricade", room.w / 2, -0.5))
-            room.entities.append(Entity(self, "barricade", room.w / 2, 0))
-            room.entities.append(Entity(self, "barricade", room.w / 2, 0.5))
+            room.addEntity(Entity(self, "barricade", room.w / 2, -0.5))
+            room.addEntity(Entity(self, "barricade", room.w / 2, 0))
+            room.addEntity(Entity(self, "barricade", room.w / 2, 0.5))
         else:
             room.layout.append(Block(self, 13, 0, 4, 22))
 
@@ -504,24 +801,140 @@ class Arena:
         room.layout.append(Block(self, 4, 4, 3, 3))
 
 
-        for i in range(random.randint(5, 12)):
-            if random.randint(1, 2) == 1:
-                ex = random.randint(-5, 5)
-                ey = random.randint(-2, 2)
+        for i in range(rng.randint(5, 12)):
+            if rng.randint(1, 2) == 1:
+                ex = rng.randint(-5, 5)
+                ey = rng.randint(-2, 2)
             else:
-                ex = random.randint(-2, 2)
-                ey = random.randint(-5, 5)
-            eid = rollGeneration(RANDOMDATA.get("spawns").get("dungeon"))
-            room.entities.append(Entity(self, eid, ex, ey))
+                ex = rng.randint(-2, 2)
+                ey = rng.randint(-5, 5)
+            eid = ROLLTABLES["spawns"]["dungeon"].roll(rng)
+            room.addEntity(Entity(self, eid, ex, ey))
 
 
-        room.entities.append(Entity(self, "dungeon_chest", 0, 0))
+        room.addEntity(Entity(self, "dungeon_chest", 0, 0))
 
+        room.bake()
 
         return room
 
 
 
+class Saver:
+
+    def __init__(self, source : SaveFile | None = None, compact = None, dirty : set[tuple[int, int]] | None = None):
+        # encoded room records by key; rooms read from the save stay as dicts until first written
+        self.fragments : dict[tuple[int, int], str | dict] = {}
+        # binary saves keep unchanged records in the mapped file instead
+        self.source = source
+        # reduces a snapshot record to what has to be written, off the main thread
+        self.compact = compact
+        # the owner's dirty set, refilled with a snapshot's rooms when writing it fails
+        self.dirty = dirty
+        # rooms whose last written record can be read back with record()
+        self.written : set[tuple[int, int]] = set()
+        self.lock = threading.Lock()
+        self.thread : threading.Thread | None = None
+
+    def busy(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def holds(self, key : tuple[int, int]) -> bool:
+        if self.source is not None: return key in self.source.index
+        return key in self.fragments
+
+    def record(self, rx : int, ry : int) -> dict:
+        if self.source is not None: return self.source.room(rx, ry)
+        fragment = self.fragments[(rx, ry)]
+        if isinstance(fragment, str):
+            return json.loads(fragment)
+        return fragment
+
+    def start(self, path : str, header : dict, changed : dict, order : list):
+        self.thread = threading.Thread(target = self.write, args = (path, header, changed, order))
+        self.thread.start()
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def write(self, path : str, header : dict, changed : dict, order : list):
+        with self.lock:
+            temp = path + ".tmp"
+            try:
+                if self.compact is not None:
+                    changed = {key: self.compact(roomData) for key, roomData in changed.items()}
+
+                if self.source is not None:
+                    self.writeBinary(temp, header, changed, order)
+                else:
+                    self.writeJson(temp, header, changed, order)
+
+                if self.source is not None and os.path.abspath(path) == os.path.abspath(self.source.path):
+                    self.source.replace(temp)
+                    self.written.update(changed)
+                else:
+                    os.replace(temp, path)
+                    if self.source is None:
+                        self.written.update(changed)
+            except Exception:
+                # nothing reached the disk, so these rooms still differ from it
+                if self.dirty is not None:
+                    self.dirty.update(changed)
+                if os.path.exists(temp):
+                    os.remove(temp)
+                raise
+
+    def writeJson(self, temp : str, header : dict, changed : dict, order : list):
+        for key, roomData in changed.items():
+            self.fragments[key] = json.dumps(roomData)
+
+        rooms = []
+        for key in order:
+            fragment = self.fragments[key]
+            if not isinstance(fragment, str):
+                fragment = self.fragments[key] = json.dumps(fragment)
+            rooms.append(fragment)
+
+        # same text json.dump would give for the whole save
+        text = json.dumps(header)[:-1] + ', "rooms": [' + ", ".join(rooms) + "]}"
+
+        with open(temp, "w") as output:
+            output.write(text)
+            output.flush()
+            os.fsync(output.fileno())
+
+    def writeBinary(self, temp : str, header : dict, changed : dict, order : list):
+        rooms = []
+        for key in order:
+            roomData = changed.get(key)
+            if roomData is not None:
+                rooms.append((*key, roomData.get("type"), roomData.get("entrances"), encodeRoom(roomData)))
+            else:
+                offset, _type, entrances = self.source.index[key]
+                rooms.append((*key, _type, entrances, self.source.record(*key)))
+
+        with open(temp, "wb") as output:
+            writeSave(output, header, rooms)
+            output.flush()
+            os.fsync(output.fileno())
+
+
+
+class RoomStub:
+
+    __slots__ = ("rx", "ry", "type", "ew", "ea", "es", "ed", "data")
+
+    def __init__(self, rx : int, ry : int, _type : str, entrances : list[bool], data : dict | None = None):
+        self.rx, self.ry = rx, ry
+        self.type : str = _type
+        self.ew, self.ea, self.es, self.ed = entrances
+        # None when the saver holds the current record
+        self.data : dict | None = data
+
+
+
 class Room:
 
     def __init__(
@@ -533,7 +946,6 @@ class Room:
         h : int,
         layout : list,
         entities : list,
-        particles : list,
         _type : str = "DEBUG",
         entrances : tuple[bool, bool, bool, bool] = (False, False, False, False),
     ):
@@ -542,20 +954,138 @@ class Room:
         self.w, self.h = w, h
         self.layout : list[Block] = layout
         self.entities : list[Entity] = entities
-        self.particles : list[Particle] = particles
+        self.particles = ParticleStore()
         self.light : list[Light] = []
 
         self.type : str = _type
 
         self.ew, self.ea, self.es, self.ed = entrances
+        # seeded rooms regenerate from Arena.seed and only save their differences
+        self.seeded : bool = False
+
+        # live entities by id and by flag, and the ghostlike ones by position
+        self.ids : dict[str, dict[Entity, None]] = {}
+        self.flags : dict[str, dict[Entity, None]] = {
+            "ghostlike": {}, "interactable": {}, "temporary": {}, "opponent": {},
+        }
+        self.targets = SpatialHash()
+        for entity in self.entities:
+            self.attach(entity)
+
+        # spawns and removals made while ticking, applied by flush
+        self.ticking : bool = False
+        self.spawns : list[Entity] = []
+        self.removals : list[Entity] = []
+
+        self.bake()
+
+    def bake(self):
+        self.collision = BlockGrid(self.layout)
+
+    def attach(self, entity):
+        entity.room = self
+        kind = entity.kind
+        self.ids.setdefault(entity.id, {})[entity] = None
+        for flag, members in self.flags.items():
+            if getattr(kind, flag):
+                members[entity] = None
+        if kind.ghostlike:
+            self.targets.insert(entity)
+
+    def detach(self, entity):
+        members = self.ids.get(entity.id)
+        if members is not None and entity in members:
+            del members[entity]
+            if not members:
+                del self.ids[entity.id]
+        for members in self.flags.values():
+            members.pop(entity, None)
+        self.targets.remove(entity)
+
+    def addEntity(self, entity):
+        if self.ticking:
+            entity.room = self
+            self.spawns.append(entity)
+        else:
+            self.entities.append(entity)
+            self.attach(entity)
+        return entity
+
+    def removeEntity(self, entity):
+        self.detach(entity)
+        if self.ticking:
+            self.removals.append(entity)
+        else:
+            self.entities.remove(entity)
+
+    def hasPlayer(self) -> bool:
+        return self.arena.current is self
+
+    def newEntity(self, _id : str, x : float, y : float, **meta : int | float | str):
+        return self.addEntity(Entity(self.arena, _id, x, y, **meta))
+
+    def newParticle(
+        self,
+        _id : str,
+        x : float,
+        y : float,
+        vx : float,
+        vy : float,
+        t : int,
+        ax : float = 0.0,
+        ay : float = 0.0,
+    ):
+        return self.particles.spawn(_id, x, y, vx, vy, t, ax, ay)
+
+    def newParticles(
+        self,
+        _id : str,
+        x : float,
+        y : float,
+        vx : numpy.ndarray,
+        vy : numpy.ndarray,
+        t : int,
+    ):
+        return self.particles.spawnMany(_id, x, y, vx, vy, t)
+
+    def flash(self, x : float, y : float, force : int = 12, duration : int = 30):
+        self.light.append(Light(x, y, force, duration))
+
+    def shake(self, force : float, duration : int):
+        if self.hasPlayer():
+            self.arena.camera.shake(force, duration)
+
+    def countOpponents(self) -> int:
+        return len(self.flags["opponent"])
+
+    def countEntity(self, _id : str) -> int:
+        return len(self.ids.get(_id, ()))
+
+    def flush(self):
+        if self.removals:
+            removed = set(self.removals)
+            self.entities[:] = [entity for entity in self.entities if not entity in removed]
+            self.removals.clear()
+        for entity in self.spawns:
+            self.entities.append(entity)
+            self.attach(entity)
+        self.spawns.clear()
 
     def tick(self):
+        profiler = self.arena.profiler
+        self.arena.dirty.add((self.rx, self.ry))
+        self.ticking = True
         for entity in self.entities:
-            entity.tick()
+            entity.px, entity.py = entity.x, entity.y
+            if profiler:
+                start = time.perf_counter_ns()
+                entity.tick()
+                profiler.entity(entity.id, time.perf_counter_ns() - start)
+            else:
+                entity.tick()
             if entity.destroy:
                 if entity.destroyTimer == 0:
-                    self.entities.remove(entity)
-                    del entity
+                    self.removeEntity(entity)
                     continue
 
             if entity.x - entity.w / 2 < -self.w / 2:
@@ -567,14 +1097,208 @@ class Room:
             if entity.y + entity.h / 2 > self.h / 2:
                 entity.y = self.h / 2 - entity.h / 2
 
+            if entity.kind.ghostlike:
+                self.targets.move(entity)
+
+        self.ticking = False
+        self.flush()
+
         for light in self.light:
             light.tick()
+        if self.light:
+            self.light[:] = [light for light in self.light if not light.destroy]
+
+        self.particles.tick()
+
+
+
+class Profiler:
+
+    def __init__(self, smoothing : float = 0.1):
+        self.smoothing = smoothing
+        self.last : int = time.perf_counter_ns()
+
+        self.sections : dict[str, float] = {}
+        self.costs : dict[str, float] = {}
+        self.counts : dict[str, int] = {}
+        self.frame : float = 0.0
+
+        self.pending : dict[str, int] = {}
+        self.pendingCosts : dict[str, int] = {}
+        self.pendingCounts : dict[str, int] = {}
+
+    def begin(self):
+        self.last = time.perf_counter_ns()
+
+    def lap(self, name : str):
+        now = time.perf_counter_ns()
+        self.pending[name] = self.pending.get(name, 0) + now - self.last
+        self.last = now
+
+    def entity(self, _id : str, elapsed : int):
+        self.pendingCosts[_id] = self.pendingCosts.get(_id, 0) + elapsed
+        self.pendingCounts[_id] = self.pendingCounts.get(_id, 0) + 1
+
+    def smooth(self, averages : dict[str, float], totals : dict[str, int]):
+        for name in list(averages) + [name for name in totals if not name in averages]:
+            ms = totals.get(name, 0) / 1e6
+            averages[name] = averages.get(name, ms) + self.smoothing * (ms - averages.get(name, ms))
+
+    def commit(self):
+        self.smooth(self.sections, self.pending)
+        ms = sum(self.pending.values()) / 1e6
+        self.frame += self.smoothing * (ms - self.frame)
+        self.pending = {}
+
+    def commitStep(self):
+        # entities only tick on simulation steps, which are fewer than drawn frames
+        self.smooth(self.costs, self.pendingCosts)
+        self.counts = self.pendingCounts
+        self.pendingCosts = {}
+        self.pendingCounts = {}
+
+
+
+class SpatialHash:
+
+    def __init__(self, size : float = 2.0):
+        self.size = size
+        self.cells : dict[tuple[int, int], dict] = {}
+        self.where : dict = {}
+
+    def key(self, x : float, y : float) -> tuple[int, int]:
+        return math.floor(x / self.size), math.floor(y / self.size)
+
+    def insert(self, entity):
+        key = self.key(entity.x, entity.y)
+        self.where[entity] = key
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = {}
+        cell[entity] = None
+
+    def remove(self, entity):
+        key = self.where.pop(entity, None)
+        if key is None: return
+        cell = self.cells[key]
+        del cell[entity]
+        if not cell:
+            del self.cells[key]
+
+    def move(self, entity):
+        key = self.key(entity.x, entity.y)
+        if self.where.get(entity) == key: return
+        self.remove(entity)
+        self.insert(entity)
+
+    def queryRect(self, x0 : float, y0 : float, x1 : float, y1 : float) -> list:
+        found = []
+        cx0, cy0 = self.key(x0, y0)
+        cx1, cy1 = self.key(x1, y1)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells.get((cx, cy))
+                if not cell: continue
+                for entity in cell:
+                    if x0 <= entity.x <= x1 and y0 <= entity.y <= y1:
+                        found.append(entity)
+        return found
+
+    def queryRadius(self, x : float, y : float, r : float) -> list:
+        found = []
+        cx0, cy0 = self.key(x - r, y - r)
+        cx1, cy1 = self.key(x + r, y + r)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells.get((cx, cy))
+                if not cell: continue
+                for entity in cell:
+                    if (entity.x - x) ** 2 + (entity.y - y) ** 2 <= r * r:
+                        found.append(entity)
+        return found
+
+    def queryNearest(self, x : float, y : float, r : float, test = None):
+        target = None
+        targetdist = r
+        seen = 0
+        kx, ky = self.key(x, y)
+        for ring in range(math.ceil(r / self.size) + 1):
+            if target and targetdist <= (ring - 1) * self.size: break
+            if seen >= len(self.where): break
+            for cx in range(kx - ring, kx + ring + 1):
+                step = 1 if abs(cx - kx) == ring else 2 * ring
+                for cy in range(ky - ring, ky + ring + 1, step):
+                    cell = self.cells.get((cx, cy))
+                    if not cell: continue
+                    seen += len(cell)
+                    for entity in cell:
+                        if test and not test(entity): continue
+                        dist = math.sqrt((entity.x - x) ** 2 + (entity.y - y) ** 2)
+                        if dist < targetdist:
+                            targetdist = dist
+                            target = entity
+        return target
+
+
+
+class BlockGrid:
+
+    def __init__(self, layout : list, size : float = 1.0):
+        self.layout = layout
+        self.size = size
+        self.cells : dict[tuple[int, int], list[int]] = {}
+
+        for i, block in enumerate(self.layout):
+            cx0, cy0 = self.key(block.x - block.w / 2, block.y - block.h / 2)
+            cx1, cy1 = self.key(block.x + block.w / 2, block.y + block.h / 2)
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def key(self, x : float, y : float) -> tuple[int, int]:
+        return math.floor(x / self.size), math.floor(y / self.size)
+
+    def candidates(self, object) -> list[int]:
+        cx0, cy0 = self.key(object.x - object.w / 2, object.y - object.h / 2)
+        cx1, cy1 = self.key(object.x + object.w / 2, object.y + object.h / 2)
+        found = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell: found.extend(cell)
+        if len(found) > 1:
+            found = sorted(set(found))
+        return found
+
+    def pushOut(self, object):
+        # same order and result as testing every block of the layout in turn,
+        # candidates are looked up again after each push
+        last = -1
+        pushed = True
+        while pushed:
+            pushed = False
+            for i in self.candidates(object):
+                if i <= last: continue
+                last = i
+                block = self.layout[i]
+                w, a, s, d = block.collides(object)
+                if w: object.y = block.y - block.h / 2 - object.h / 2
+                if s: object.y = block.y + block.h / 2 + object.h / 2
+                if a: object.x = block.x - block.w / 2 - object.w / 2
+                if d: object.x = block.x + block.w / 2 + object.w / 2
+                if w or a or s or d:
+                    pushed = True
+                    break
 
-        for particle in self.particles:
-            particle.tick()
-            if particle.destroy:
-                self.particles.remove(particle)
-                del particle
+    def solidAt(self, x : float, y : float) -> bool:
+        cell = self.cells.get(self.key(x, y))
+        if not cell: return False
+        for i in cell:
+            block = self.layout[i]
+            if block.x - block.w / 2 < x < block.x + block.w / 2:
+                if block.y - block.h / 2 < y < block.y + block.h / 2:
+                    return True
+        return False
 
 
 
@@ -678,7 +1402,7 @@ class Player:
         self.eliminated : bool = False
 
     def getRoom(self):
-        return self.arena.getRoom(self.rx, self.ry)
+        return self.arena.current
 
     def moveX(self, dx : float):
         if self.stun > 0: return
@@ -718,12 +1442,7 @@ class Player:
         if self.stun > 0:
             self.stun -= 1
 
-        for block in self.getRoom().layout:
-            w, a, s, d = block.collides(self)
-            if w: self.y = block.y - block.h / 2 - self.h / 2
-            if s: self.y = block.y + block.h / 2 + self.h / 2
-            if a: self.x = block.x - block.w / 2 - self.w / 2
-            if d: self.x = block.x + block.w / 2 + self.w / 2
+        self.getRoom().collision.pushOut(self)
 
 
 
@@ -733,11 +1452,15 @@ class Camera:
         self.player = player
         self.x : float = 0.0
         self.y : float = 0.0
+        # position after the previous tick, for drawing between ticks
+        self.px : float = 0.0
+        self.py : float = 0.0
 
         self.shakeForce = 0.0
         self.shakeTimer = 0
 
     def tick(self):
+        self.px, self.py = self.x, self.y
         self.x = self.player.x
         self.y = self.player.y
 
@@ -752,17 +1475,58 @@ class Camera:
         if duration > self.shakeTimer:
             self.shakeTimer = duration
 
-    def get(self):
+    def snap(self):
+        self.x, self.y = self.player.x, self.player.y
+        self.px, self.py = self.x, self.y
+
+    def lerp(self, alpha : float = 1.0):
         return (
-            self.x + self.shakeForce * random.randint(-25, 25) / 100,
-            self.y + self.shakeForce * random.randint(-25, 25) / 100,
+            self.px + (self.x - self.px) * alpha,
+            self.py + (self.y - self.py) * alpha,
         )
 
+    def get(self, alpha : float = 1.0):
+        x, y = self.lerp(alpha)
+        return (
+            x + self.shakeForce * random.randint(-25, 25) / 100,
+            y + self.shakeForce * random.randint(-25, 25) / 100,
+        )
 
 
-class Particle:
 
-    def __init__(
+class ParticleStore:
+
+    def __init__(self, capacity : int = 256):
+        self.count : int = 0
+        self.pos = numpy.zeros((capacity, 2))
+        self.vel = numpy.zeros((capacity, 2))
+        self.acc = numpy.zeros((capacity, 2))
+        self.timer = numpy.zeros(capacity, numpy.int32)
+        self.t = numpy.zeros(capacity, numpy.int32)
+        self.sprite = numpy.zeros(capacity, numpy.int32)
+
+        self.pending : list[tuple] = []
+
+    def __len__(self) -> int:
+        return self.count + len(self.pending)
+
+    def sprites(self, _id : str) -> int:
+        index = PARTICLEINDEX.get(_id)
+        if index is None:
+            index = PARTICLEINDEX[_id] = len(PARTICLES)
+            PARTICLES.append(_id)
+        return index
+
+    def reserve(self, amount : int):
+        if self.count + amount <= len(self.t): return
+        capacity = max(len(self.t) * 2, self.count + amount)
+        for name in ("pos", "vel", "acc", "timer", "t", "sprite"):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(
         self,
         _id : str,
         x : float,
@@ -773,23 +1537,64 @@ class Particle:
         ax : float = 0.0,
         ay : float = 0.0,
     ):
-        self.id = _id
-        self.x, self.y = x, y
-        self.vx, self.vy = vx, vy
-        self.ax, self.ay = ax, ay
-        self.t = t
-        self.timer : int = 0
-
-        self.destroy : bool = False
+        self.pending.append((x, y, vx, vy, ax, ay, t, self.sprites(_id)))
+
+    def flush(self):
+        if not self.pending: return
+        amount = len(self.pending)
+        self.reserve(amount)
+        fill = slice(self.count, self.count + amount)
+        rows = numpy.array(self.pending)
+        self.pos[fill] = rows[:, 0:2]
+        self.vel[fill] = rows[:, 2:4]
+        self.acc[fill] = rows[:, 4:6]
+        self.timer[fill] = 0
+        self.t[fill] = rows[:, 6]
+        self.sprite[fill] = rows[:, 7]
+        self.count += amount
+        self.pending.clear()
+
+    def spawnMany(
+        self,
+        _id : str,
+        x : float,
+        y : float,
+        vx : numpy.ndarray,
+        vy : numpy.ndarray,
+        t : int,
+    ):
+        self.flush()
+        amount = len(vx)
+        self.reserve(amount)
+        fill = slice(self.count, self.count + amount)
+        self.pos[fill] = x, y
+        self.vel[fill, 0] = vx
+        self.vel[fill, 1] = vy
+        self.acc[fill] = 0.0
+        self.timer[fill] = 0
+        self.t[fill] = t
+        self.sprite[fill] = self.sprites(_id)
+        self.count += amount
+
+    def clear(self):
+        self.count = 0
+        self.pending.clear()
 
     def tick(self):
-        self.timer += 1
-        self.x += self.vx
-        self.y += self.vy
-        self.vx += self.ax
-        self.vy += self.ay
-        if self.timer >= self.t:
-            self.destroy = True
+        self.flush()
+        n = self.count
+        if n == 0: return
+        self.timer[:n] += 1
+        self.pos[:n] += self.vel[:n]
+        self.vel[:n] += self.acc[:n]
+
+        alive = self.timer[:n] < self.t[:n]
+        if alive.all(): return
+        for name in ("pos", "vel", "acc", "timer", "t", "sprite"):
+            array = getattr(self, name)
+            kept = array[:n][alive]
+            array[:len(kept)] = kept
+        self.count = int(alive.sum())
 
 
 
@@ -817,6 +1622,8 @@ class Item:
 
         self.timer : int = 0
 
+        self.hooks = resolveHooks(Item, self.id, ("tick", "apply", "dapply", "equip"))
+
         self.equip()
 
     def tick(self):
@@ -827,7 +1634,7 @@ class Item:
             if self.reloads == 0:
                 self.ammo = self.max_ammo
 
-        return getattr(self, f"tick_{self.id}", self.tick_null)()
+        return self.hooks["tick"](self)
 
     def tick_null(self):
         return
@@ -850,10 +1657,10 @@ class Item:
                 return
             self.ammo -= 1
 
-        return getattr(self, f"apply_{self.id}", self.apply_null)(point)
+        return self.hooks["apply"](self, point)
 
     def equip(self):
-        return getattr(self, f"equip_{self.id}", self.equip_null)()
+        return self.hooks["equip"](self)
     def equip_null(self):
         return
 
@@ -871,7 +1678,7 @@ class Item:
                     return
                 self.ammo -= 1
 
-        return getattr(self, f"dapply_{self.id}", self.dapply_null)(point)
+        return self.hooks["dapply"](self, point)
 
 
     def apply_null(self, point : tuple[float, float]):
@@ -891,15 +1698,14 @@ class Item:
         self.arena.camera.shake(0.2, FRAMERATE // 8)
         self.arena.player.hitstun(FRAMERATE // 4)
 
-        for e in range(-9, 9 + 1, 1):
-            theta = angle + e / 180 * math.pi
-            self.arena.newParticle(
-                "powder",
-                shotX, shotY,
-                0.15 * math.cos(theta),
-                0.15 * math.sin(theta),
-                FRAMERATE // 4,
-            )
+        theta = angle + numpy.arange(-9, 9 + 1) / 180 * math.pi
+        self.arena.newParticles(
+            "powder",
+            shotX, shotY,
+            0.15 * numpy.cos(theta),
+            0.15 * numpy.sin(theta),
+            FRAMERATE // 4,
+        )
 
         for i in range(-9, 9 + 1, 3):
             theta = angle + i / 180 * math.pi
@@ -1042,26 +1848,67 @@ class Item:
         )
 
 
+class EntityType:
+
+    __slots__ = (
+        "id", "name", "w", "h", "max_hp",
+        "ghostlike", "interactable", "temporary", "opponent", "immune",
+        "hooks", "state",
+    )
+
+    def __init__(self, _id : str):
+        data = ENTITYDATA.get(_id, {})
+        self.id = _id
+        self.name : str = data.get("name", "???")
+        self.w : float = data.get("w", 0.75)
+        self.h : float = data.get("h", 0.75)
+        self.max_hp : int = data.get("max_hp", 0)
+
+        self.ghostlike : bool = data.get("ghost", True)
+        self.interactable : bool = data.get("interact", False)
+        self.temporary : bool = data.get("temporary", False)
+        self.opponent : bool = data.get("opponent", False)
+        self.immune : bool = data.get("immune", False)
+
+        self.hooks = resolveHooks(Entity, _id, ("tick", "damage", "interact", "animate"))
+        self.state : tuple[tuple[str, object], ...] = tuple(
+            (METAFIELDS[key], value) for key, value in ENTITYSTATE.get(_id, {}).items()
+        )
+
+ENTITYTYPES : dict[str, EntityType] = {}
+
+def entityType(_id : str) -> EntityType:
+    kind = ENTITYTYPES.get(_id)
+    if kind is None:
+        kind = ENTITYTYPES[_id] = EntityType(_id)
+    return kind
+
+
+
 class Entity:
 
+    __slots__ = (
+        "arena", "room", "id", "kind",
+        "x", "y", "w", "h", "hp",
+        "kb", "kbangle", "kbforce",
+        "destroy", "destroyTimer", "timer",
+        "angle", "velocity", "duration", "cooldown", "fuse", "base", "opened", "item_id",
+        "extra", "origin", "px", "py",
+    )
+
     def __init__(self, arena, _id : str, x : float, y : float, **meta : int | float | str):
         self.arena : Arena = arena
+        # set when the entity is added to a room
+        self.room : Room | None = None
         self.id = _id
-        self.meta = meta
-        self._data = ENTITYDATA.get(self.id, {})
+        self.kind : EntityType = entityType(_id)
 
         self.x, self.y = x, y
-        self.w : float = self._data.get("w", 0.75)
-        self.h : float = self._data.get("h", 0.75)
-
-        self.name : str = self._data.get("name", "???")
-        self.max_hp : int = self._data.get("max_hp", 0)
-        self.hp = self.max_hp
-        self.ghostlike : bool = self._data.get("ghost", True)
-        self.interactable : bool = self._data.get("interact", False)
-        self.temporary : bool = self._data.get("temporary", False)
-        self.opponent : bool = self._data.get("opponent", False)
-        self.immune : bool = self._data.get("immune", False)
+        # position before the latest tick, for drawing between ticks
+        self.px, self.py = x, y
+        self.w : float = self.kind.w
+        self.h : float = self.kind.h
+        self.hp : int = self.kind.max_hp
 
         self.kb : int = 0
         self.kbangle : int = 0
@@ -1072,8 +1919,49 @@ class Entity:
 
         self.timer : int = 0
 
+        self.base : float | None = None
+        self.item_id : str | None = None
+        self.extra : dict | None = None
+        # position in its room's generated entity list, None for anything added later
+        self.origin : int | None = None
+        for field, value in self.kind.state:
+            setattr(self, field, value)
+        for key, value in meta.items():
+            field = METAFIELDS.get(key)
+            if field:
+                setattr(self, field, value)
+            else:
+                if self.extra is None: self.extra = {}
+                self.extra[key] = value
+
+    @property
+    def meta(self) -> dict:
+        meta = {}
+        for key, field in METAFIELDS.items():
+            value = getattr(self, field, None)
+            if value is not None:
+                meta[key] = value
+        if self.extra:
+            meta.update(self.extra)
+        return meta
+
+    @property
+    def name(self) -> str: return self.kind.name
+    @property
+    def max_hp(self) -> int: return self.kind.max_hp
+    @property
+    def ghostlike(self) -> bool: return self.kind.ghostlike
+    @property
+    def interactable(self) -> bool: return self.kind.interactable
+    @property
+    def temporary(self) -> bool: return self.kind.temporary
+    @property
+    def opponent(self) -> bool: return self.kind.opponent
+    @property
+    def immune(self) -> bool: return self.kind.immune
+
     def knockback(self, force : float, angle : int, duration : int):
-        if self.immune: return
+        if self.kind.immune: return
         self.kbforce = force
         self.kbangle = angle
         self.kb = duration
@@ -1082,49 +1970,43 @@ class Entity:
         if self.destroyTimer > 0:
             self.destroyTimer -= 1
             return
-        f = getattr(self, f"tick_{self.id}", self.tick_null)()
+        f = self.kind.hooks["tick"](self)
         self.timer += 1
 
-        if self.ghostlike:
+        if self.kind.ghostlike:
 
             if self.kb > 0:
                 self.x += self.kbforce * math.cos(self.kbangle / 180 * math.pi)
                 self.y += self.kbforce * math.sin(self.kbangle / 180 * math.pi)
                 self.kb -= 1
 
-        for block in self.arena.player.getRoom().layout:
-            w, a, s, d = block.collides(self)
-            # print(w, a, s, d) #
-            if w: self.y = block.y - block.h / 2 - self.h / 2
-            if s: self.y = block.y + block.h / 2 + self.h / 2
-            if a: self.x = block.x - block.w / 2 - self.w / 2
-            if d: self.x = block.x + block.w / 2 + self.w / 2
+        self.room.collision.pushOut(self)
         return f
 
     def damage(self, amount : int, angle : int = 90) -> int:
         if self.destroyTimer > 0: return
-        if self.immune: return
+        if self.kind.immune: return
         total = amount * 4
-        damage = getattr(self, f"damage_{self.id}", self.damage_null)(amount)
-        for i in range(round(angle - total // 2), round(angle + total // 2)):
-            self.arena.newParticle(
-                "heart",
-                self.x, self.y,
-                (0.15 + self.kbforce) * math.cos(i / 180 * math.pi),
-                (0.15 + self.kbforce) * math.sin(i / 180 * math.pi),
-                FRAMERATE // 8,
-            )
+        damage = self.kind.hooks["damage"](self, amount)
+        theta = numpy.arange(round(angle - total // 2), round(angle + total // 2)) / 180 * math.pi
+        self.room.newParticles(
+            "heart",
+            self.x, self.y,
+            (0.15 + self.kbforce) * numpy.cos(theta),
+            (0.15 + self.kbforce) * numpy.sin(theta),
+            FRAMERATE // 8,
+        )
         return damage
 
     def interact(self):
-        if not self.interactable: return
-        return getattr(self, f"interact_{self.id}", self.interact_null)()
+        if not self.kind.interactable: return
+        return self.kind.hooks["interact"](self)
 
     def animate(self) -> tuple[str, int]:
         # if self.ghostlike:
         #     if self.destroyTimer > 0:
         #         return f"knockout_{self.id}"
-        return getattr(self, f"animate_{self.id}", self.animate_null)()
+        return self.kind.hooks["animate"](self)
 
 
     def tick_null(self):
@@ -1148,9 +2030,7 @@ class Entity:
 
 
     def tick_spider(self):
-        if not "cooldown" in self.meta.keys():
-            self.meta["cooldown"] = 0
-
+        if not self.room.hasPlayer(): return
         distance = math.sqrt(
             (self.x - self.arena.player.x) ** 2 + (self.y - self.arena.player.y) ** 2
         )
@@ -1162,32 +2042,29 @@ class Entity:
             self.x += 0.05 * math.cos(angle)
             self.y += 0.05 * math.sin(angle)
 
-        if self.meta["cooldown"] > 0:
-            self.meta["cooldown"] -= 1
+        if self.cooldown > 0:
+            self.cooldown -= 1
 
         if distance < 4:
-            if self.meta["cooldown"] == 0:
-                self.arena.newEntity(
+            if self.cooldown == 0:
+                self.room.newEntity(
                     "web",
                     self.x, self.y,
                     angle = angle * 180 / math.pi,
                     velocity = 0.15,
                 )
-                self.meta["cooldown"] = FRAMERATE * 2
+                self.cooldown = FRAMERATE * 2
 
 
     def damage_explosive_spider(self, amount : int):
-        if self.meta["timer"] == 0:
-            self.meta["timer"] = FRAMERATE * 2
+        if self.fuse == 0:
+            self.fuse = FRAMERATE * 2
         return 0
         # else:
-            # self.meta["timer"] //= 2
+            # self.fuse //= 2
 
     def tick_explosive_spider(self):
-        if not "timer" in self.meta.keys():
-            self.meta["timer"] = 0
-
-        if self.meta["timer"] == 0:
+        if self.fuse == 0 and self.room.hasPlayer():
             distance = math.sqrt(
                 (self.x - self.arena.player.x) ** 2 + (self.y - self.arena.player.y) ** 2
             )
@@ -1199,10 +2076,10 @@ class Entity:
                 self.x += 0.05 * math.cos(angle)
                 self.y += 0.05 * math.sin(angle)
 
-        if self.meta["timer"] > 0:
+        if self.fuse > 0:
             theta = (random.randint(90 - 35, 90 + 35) + 180) / 180 * math.pi
-            self.meta["timer"] -= 1
-            self.arena.newParticle(
+            self.fuse -= 1
+            self.room.newParticle(
                 f"flame{random.randint(0, 2)}",
                 self.x, self.y,
                 0.15 * math.cos(theta),
@@ -1210,12 +2087,12 @@ class Entity:
                 FRAMERATE // 4,
             )
 
-            if self.meta["timer"] == 0:
+            if self.fuse == 0:
                 self.destroy = True
-                self.arena.flash(self.x, self.y, 120, FRAMERATE // 4)
-                self.arena.camera.shake(0.75, FRAMERATE // 2)
+                self.room.flash(self.x, self.y, 120, FRAMERATE // 4)
+                self.room.shake(0.75, FRAMERATE // 2)
                 for angle in range(0, 360, 5):
-                    self.arena.newEntity(
+                    self.room.newEntity(
                         "flameball",
                         self.x + 0.25 * math.cos(angle / 180 * math.pi),
                         self.y + 0.25 * math.sin(angle / 180 * math.pi),
@@ -1226,141 +2103,121 @@ class Entity:
                 self.destroyTimer = FRAMERATE# // 2
 
     def animate_explosive_spider(self):
-        if not "timer" in self.meta.keys():
-            self.meta["timer"] = 0
-        if self.meta["timer"] > 0:
+        if self.fuse > 0:
             return "entity_explosive_spider_fuse", 0
         else:
             return "entity_explosive_spider", 0
 
 
     def tick_web(self):
-        self.x += self.meta.get("velocity", 0.15) * math.cos(self.meta.get("angle", 0) / 180 * math.pi)
-        self.y += self.meta.get("velocity", 0.15) * math.sin(self.meta.get("angle", 0) / 180 * math.pi)
+        self.x += self.velocity * math.cos(self.angle / 180 * math.pi)
+        self.y += self.velocity * math.sin(self.angle / 180 * math.pi)
 
         distance = math.sqrt((self.x - self.arena.player.x) ** 2 + (self.y - self.arena.player.y) ** 2)
-        if distance <= (self.arena.player.w + self.arena.player.h) / 2:
+        if distance <= (self.arena.player.w + self.arena.player.h) / 2 and self.room.hasPlayer():
             self.arena.player.damage(1)
-            self.arena.player.knockback(0.15, self.meta.get("angle", 0), FRAMERATE // 8)
+            self.arena.player.knockback(0.15, self.angle, FRAMERATE // 8)
             self.destroy = True
 
-        if self.timer >= self.meta.get("duration", FRAMERATE // 4):
+        if self.timer >= self.duration:
             self.destroy = True
 
-        for block in self.arena.player.getRoom().layout:
-            if block.x - block.w / 2 < self.x < block.x + block.w / 2:
-                if block.y - block.h / 2 < self.y < block.y + block.h / 2:
-                    self.destroy = True
-                    break
+        if self.room.collision.solidAt(self.x, self.y):
+            self.destroy = True
 
 
     def tick_bullet(self):
-        self.x += self.meta.get("velocity", 0.15) * math.cos(self.meta.get("angle", 0) / 180 * math.pi)
-        self.y += self.meta.get("velocity", 0.15) * math.sin(self.meta.get("angle", 0) / 180 * math.pi)
+        self.x += self.velocity * math.cos(self.angle / 180 * math.pi)
+        self.y += self.velocity * math.sin(self.angle / 180 * math.pi)
 
-        for entity in self.arena.player.getRoom().entities:
-            if not entity.ghostlike: continue
+        for entity in self.room.targets.queryRadius(self.x, self.y, REACH):
             if math.sqrt((self.x - entity.x) ** 2 + (self.y - entity.y) ** 2) <= (entity.w + entity.h) / 2:
-                entity.damage(1, self.meta.get("angle", 0))
-                entity.knockback(0.35, self.meta.get("angle", 0), FRAMERATE // 8)
+                entity.damage(1, self.angle)
+                entity.knockback(0.35, self.angle, FRAMERATE // 8)
                 self.destroy = True
 
-        if self.timer >= self.meta.get("duration", FRAMERATE // 4):
+        if self.timer >= self.duration:
             self.destroy = True
 
-        for block in self.arena.player.getRoom().layout:
-            if block.x - block.w / 2 < self.x < block.x + block.w / 2:
-                if block.y - block.h / 2 < self.y < block.y + block.h / 2:
-                    self.destroy = True
-                    break
+        if self.room.collision.solidAt(self.x, self.y):
+            self.destroy = True
 
     def damage_bullet(self, amount : int):
         return 0
 
     def animate_bullet(self):
-        return "entity_bullet", self.meta.get("angle", 0)
+        return "entity_bullet", self.angle
 
 
     def tick_dagger(self):
-        self.x += self.meta.get("velocity", 0.15) * math.cos(self.meta.get("angle", 0) / 180 * math.pi)
-        self.y += self.meta.get("velocity", 0.15) * math.sin(self.meta.get("angle", 0) / 180 * math.pi)
+        self.x += self.velocity * math.cos(self.angle / 180 * math.pi)
+        self.y += self.velocity * math.sin(self.angle / 180 * math.pi)
 
-        for entity in self.arena.player.getRoom().entities:
-            if not entity.ghostlike: continue
+        for entity in self.room.targets.queryRadius(self.x, self.y, REACH):
             if math.sqrt((self.x - entity.x) ** 2 + (self.y - entity.y) ** 2) <= (entity.w + entity.h) / 2:
-                entity.damage(2, self.meta.get("angle", 0))
-                entity.knockback(0.35, self.meta.get("angle", 0), FRAMERATE // 8)
+                entity.damage(2, self.angle)
+                entity.knockback(0.35, self.angle, FRAMERATE // 8)
                 # self.destroy = True #
 
-        if self.timer >= self.meta.get("duration", FRAMERATE // 4):
+        if self.timer >= self.duration:
             self.destroy = True
 
-        for block in self.arena.player.getRoom().layout:
-            if block.x - block.w / 2 < self.x < block.x + block.w / 2:
-                if block.y - block.h / 2 < self.y < block.y + block.h / 2:
-                    self.destroy = True
-                    break
+        if self.room.collision.solidAt(self.x, self.y):
+            self.destroy = True
 
     def damage_dagger(self, amount : int):
         return 0
 
     def animate_dagger(self):
-        return "dagger", -(self.meta.get("angle", 0) + 90)
+        return "dagger", -(self.angle + 90)
 
 
     def tick_flameball(self):
-        self.x += self.meta.get("velocity", 0.15) * math.cos(self.meta.get("angle", 0) / 180 * math.pi)
-        self.y += self.meta.get("velocity", 0.15) * math.sin(self.meta.get("angle", 0) / 180 * math.pi)
+        self.x += self.velocity * math.cos(self.angle / 180 * math.pi)
+        self.y += self.velocity * math.sin(self.angle / 180 * math.pi)
 
-        self.arena.newParticle(
+        self.room.newParticle(
             f"flame{random.randint(0, 2)}",
-            self.x, self.y, 0, 0, self.meta.get("duration", FRAMERATE // 4) // 8,
+            self.x, self.y, 0, 0, self.duration // 8,
         )
 
-        for entity in self.arena.player.getRoom().entities:
-            if not entity.ghostlike: continue
+        for entity in self.room.targets.queryRadius(self.x, self.y, REACH):
             if math.sqrt((self.x - entity.x) ** 2 + (self.y - entity.y) ** 2) <= (entity.w + entity.h) / 2:
-                entity.damage(2, self.meta.get("angle", 0))
-                entity.knockback(0.25, self.meta.get("angle", 0), FRAMERATE // 8)
+                entity.damage(2, self.angle)
+                entity.knockback(0.25, self.angle, FRAMERATE // 8)
                 self.destroy = True
 
         distance = math.sqrt((self.x - self.arena.player.x) ** 2 + (self.y - self.arena.player.y) ** 2)
-        if distance <= (self.arena.player.w + self.arena.player.h) / 2:
+        if distance <= (self.arena.player.w + self.arena.player.h) / 2 and self.room.hasPlayer():
             self.arena.player.damage(2)
-            self.arena.player.knockback(0.25, self.meta.get("angle", 0), FRAMERATE // 8)
+            self.arena.player.knockback(0.25, self.angle, FRAMERATE // 8)
             self.destroy = True
 
-        if self.timer >= self.meta.get("duration", FRAMERATE // 4):
+        if self.timer >= self.duration:
             self.destroy = True
 
-        for block in self.arena.player.getRoom().layout:
-            if block.x - block.w / 2 < self.x < block.x + block.w / 2:
-                if block.y - block.h / 2 < self.y < block.y + block.h / 2:
-                    self.destroy = True
-                    break
+        if self.room.collision.solidAt(self.x, self.y):
+            self.destroy = True
 
     def damage_flameball(self, amount : int):
         return 0
 
     def animate_flameball(self):
-        return "entity_flameball", -(self.meta.get("angle", 0) + 90)
+        return "entity_flameball", -(self.angle + 90)
 
 
     def damage_methane_can(self, amount : int):
-        if self.meta["timer"] == 0:
-            self.meta["timer"] = FRAMERATE * 2
+        if self.fuse == 0:
+            self.fuse = FRAMERATE * 2
         return 0
         # else:
-            # self.meta["timer"] //= 2
+            # self.fuse //= 2
 
     def tick_methane_can(self):
-        if not "timer" in self.meta.keys():
-            self.meta["timer"] = 0
-
-        if self.meta["timer"] > 0:
+        if self.fuse > 0:
             theta = (random.randint(90 - 35, 90 + 35) + 180) / 180 * math.pi
-            self.meta["timer"] -= 1
-            self.arena.newParticle(
+            self.fuse -= 1
+            self.room.newParticle(
                 f"flame{random.randint(0, 2)}",
                 self.x, self.y,
                 0.15 * math.cos(theta),
@@ -1368,12 +2225,12 @@ class Entity:
                 FRAMERATE // 4,
             )
 
-            if self.meta["timer"] == 0:
+            if self.fuse == 0:
                 self.destroy = True
-                self.arena.flash(self.x, self.y, 120, FRAMERATE // 4)
-                self.arena.camera.shake(0.75, FRAMERATE // 2)
+                self.room.flash(self.x, self.y, 120, FRAMERATE // 4)
+                self.room.shake(0.75, FRAMERATE // 2)
                 for angle in range(0, 360, 5):
-                    self.arena.newEntity(
+                    self.room.newEntity(
                         "flameball",
                         self.x, self.y,
                         angle = angle,
@@ -1382,19 +2239,18 @@ class Entity:
                     )
 
     def animate_methane_can(self):
-        if self.meta["timer"] > 0:
+        if self.fuse > 0:
             return "entity_methane_can_fuse", 0
         else:
             return "entity_methane_can", 0
 
     def interact_methane_can(self):
-
         if self.arena.player.item:
 
             swap = self.arena.player.item.id
             self.arena.player.item.id = "methane_can"
             self.arena.player.item.loadData()
-            self.arena.newEntity("item", self.x, self.y, item_id = swap)
+            self.room.newEntity("item", self.x, self.y, item_id = swap)
             self.destroy = True
 
         else:
@@ -1409,7 +2265,7 @@ class Entity:
         return 0
 
     def tick_barricade(self):
-        if self.arena.countOpponents() == 0:
+        if self.room.countOpponents() == 0:
             self.destroy = True
 
         angle = math.atan2(
@@ -1419,34 +2275,33 @@ class Entity:
             (self.x - self.arena.player.x) ** 2 + (self.y - self.arena.player.y) ** 2,
         )
 
-        if distance <= (self.arena.player.w + self.arena.player.h) / 2:
+        if distance <= (self.arena.player.w + self.arena.player.h) / 2 and self.room.hasPlayer():
             self.arena.player.knockback(0.45, angle * 180 / math.pi, FRAMERATE // 3)
             self.arena.player.hitstun(FRAMERATE // 3)
 
 
     def tick_item(self):
-        if not "base" in self.meta.keys():
-            self.meta["base"] = self.y
+        if self.base is None:
+            self.base = self.y
 
-        self.y = self.meta["base"] + 0.15 * math.sin(math.pi * (self.timer / FRAMERATE))
+        self.y = self.base + 0.15 * math.sin(math.pi * (self.timer / FRAMERATE))
         return
 
     def animate_item(self):
-        return f"item_{self.meta.get('item_id')}", 0
+        return f"item_{self.item_id}", 0
 
     def interact_item(self):
-
         if self.arena.player.item:
 
             swap = self.arena.player.item.id
-            self.arena.player.item.id = self.meta.get("item_id")
+            self.arena.player.item.id = self.item_id
             self.arena.player.item.loadData()
-            self.meta["item_id"] = swap
+            self.item_id = swap
 
         else:
 
             self.destroy = True
-            self.arena.player.item = Item(self.arena, self.meta["item_id"])
+            self.arena.player.item = Item(self.arena, self.item_id)
 
         return
 
@@ -1455,28 +2310,22 @@ class Entity:
         return 0
 
     def tick_dungeon_chest(self):
-        if not "opened" in self.meta.keys():
-            self.meta["opened"] = False
-
-        if self.arena.countOpponents() == 0 and not self.meta["opened"]:
+        if self.room.countOpponents() == 0 and not self.opened:
             totaldrop = random.randint(1, 7)
             for e in range(totaldrop):
                 angle = 2 * math.pi * e / totaldrop
-                item_id = rollGeneration(RANDOMDATA.get("loot").get("dungeon"))
-                self.arena.newEntity(
+                item_id = ROLLTABLES["loot"]["dungeon"].roll()
+                self.room.newEntity(
                     "item",
                     self.x + 2.25 * math.cos(angle),
                     self.y + 2.25 * math.sin(angle),
                     item_id = item_id,
                 )
-            self.meta["opened"] = True
+            self.opened = True
             # self.destroy = True
 
     def animate_dungeon_chest(self):
-        if not "opened" in self.meta.keys():
-            self.meta["opened"] = False
-
-        if self.meta["opened"]:
+        if self.opened:
             return "entity_dungeon_chest_open", 0
         else:
             return "entity_dungeon_chest", 0
@@ -1486,13 +2335,10 @@ class Entity:
         return 0
 
     def tick_grenade(self):
-        if not "timer" in self.meta.keys():
-            self.meta["timer"] = FRAMERATE * 3
-
-        if self.meta["timer"] > 0:
+        if self.fuse > 0:
             theta = (random.randint(90 - 35, 90 + 35) + 180) / 180 * math.pi
-            self.meta["timer"] -= 1
-            self.arena.newParticle(
+            self.fuse -= 1
+            self.room.newParticle(
                 f"flame{random.randint(0, 2)}",
                 self.x, self.y,
                 0.15 * math.cos(theta),
@@ -1500,12 +2346,12 @@ class Entity:
                 FRAMERATE // 4,
             )
 
-            if self.meta["timer"] == 0:
+            if self.fuse == 0:
                 self.destroy = True
-                self.arena.flash(self.x, self.y, 120, FRAMERATE // 4)
-                self.arena.camera.shake(0.75, FRAMERATE // 2)
+                self.room.flash(self.x, self.y, 120, FRAMERATE // 4)
+                self.room.shake(0.75, FRAMERATE // 2)
                 for angle in range(0, 360, 5):
-                    self.arena.newEntity(
+                    self.room.newEntity(
                         "flameball",
                         self.x + 0.25 * math.cos(angle / 180 * math.pi),
                         self.y + 0.25 * math.sin(angle / 180 * math.pi),
@@ -1519,46 +2365,37 @@ class Entity:
         return 0
 
     def tick_turret(self):
-        if not "angle" in self.meta.keys():
-            self.meta["angle"] = 0
-        if not "timer" in self.meta.keys():
-            self.meta["timer"] = 0
-        self.arena.newParticle("turret_base", self.x, self.y + 0.3, 0, 0, 2)
-
-        target = None
-        targetdist = 99999
+        self.room.newParticle("turret_base", self.x, self.y + 0.3, 0, 0, 2)
 
-        for entity in self.arena.player.getRoom().entities:
-            if not entity.opponent: continue
-            dist = math.sqrt((self.x - entity.x) ** 2 + (self.y - entity.y) ** 2)
-            if dist < targetdist:
-                targetdist = dist
-                target = entity
+        room = self.room
+        target = room.targets.queryNearest(
+            self.x, self.y, room.w + room.h, lambda entity: entity.kind.opponent,
+        )
 
         if not target:
-            self.meta["angle"] = 0
-            self.meta["timer"] = 0
+            self.angle = 0
+            self.fuse = 0
 
         else:
             angle = math.atan2(
                 self.y - target.y, self.x - target.x,
             ) * 180 / math.pi
             # print(target.id, angle) #
-            self.meta["angle"] = angle
+            self.angle = angle
 
-            if self.meta["timer"] > 0:
-                self.meta["timer"] -= 1
+            if self.fuse > 0:
+                self.fuse -= 1
             else:
-                self.meta["timer"] = FRAMERATE // 7
+                self.fuse = FRAMERATE // 7
 
-                self.arena.flash(
+                self.room.flash(
                     self.x + 0.75 * math.cos(angle / 180 * math.pi + math.pi),
                     self.y + 0.75 * math.sin(angle / 180 * math.pi + math.pi),
                     120, FRAMERATE // 4,
                 )
-                self.arena.camera.shake(0.05, FRAMERATE // 8)
+                self.room.shake(0.05, FRAMERATE // 8)
 
-                self.arena.newEntity(
+                self.room.newEntity(
                     "bullet",
                     self.x + 0.75 * math.cos(angle / 180 * math.pi + math.pi),
                     self.y + 0.75 * math.sin(angle / 180 * math.pi + math.pi),
@@ -1567,23 +2404,18 @@ class Entity:
                     duration = FRAMERATE,
                 )
 
-        # print(self.meta["timer"])
+        # print(self.fuse)
 
     def animate_turret(self):
-        if not "angle" in self.meta.keys():
-            self.meta["angle"] = 0
-        if not "timer" in self.meta.keys():
-            self.meta["timer"] = 0
-        return "entity_turret", -(self.meta["angle"] + 180)
+        return "entity_turret", -(self.angle + 180)
 
     def interact_turret(self):
-
         if self.arena.player.item:
 
             swap = self.arena.player.item.id
             self.arena.player.item.id = "turret"
             self.arena.player.item.loadData()
-            self.arena.newEntity("item", self.x, self.y, item_id = swap)
+            self.room.newEntity("item", self.x, self.y, item_id = swap)
             self.destroy = True
 
         else:
@@ -1595,41 +2427,37 @@ class Entity:
 
 
     def tick_rocket(self):
-        self.x += self.meta.get("velocity", 0.15) * math.cos(self.meta.get("angle", 0) / 180 * math.pi)
-        self.y += self.meta.get("velocity", 0.15) * math.sin(self.meta.get("angle", 0) / 180 * math.pi)
+        self.x += self.velocity * math.cos(self.angle / 180 * math.pi)
+        self.y += self.velocity * math.sin(self.angle / 180 * math.pi)
 
-        self.arena.newParticle(
+        self.room.newParticle(
             f"flame{random.randint(0, 2)}",
-            self.x, self.y, 0, 0, self.meta.get("duration", FRAMERATE // 4) // 8,
+            self.x, self.y, 0, 0, self.duration // 8,
         )
 
-        for entity in self.arena.player.getRoom().entities:
-            if not entity.ghostlike: continue
+        for entity in self.room.targets.queryRadius(self.x, self.y, REACH):
             if math.sqrt((self.x - entity.x) ** 2 + (self.y - entity.y) ** 2) <= (entity.w + entity.h) / 2:
-                entity.damage(2, self.meta.get("angle", 0))
-                entity.knockback(0.25, self.meta.get("angle", 0), FRAMERATE // 8)
+                entity.damage(2, self.angle)
+                entity.knockback(0.25, self.angle, FRAMERATE // 8)
                 self.destroy = True
 
         distance = math.sqrt((self.x - self.arena.player.x) ** 2 + (self.y - self.arena.player.y) ** 2)
-        if distance <= (self.arena.player.w + self.arena.player.h) / 2:
+        if distance <= (self.arena.player.w + self.arena.player.h) / 2 and self.room.hasPlayer():
             self.arena.player.damage(2)
-            self.arena.player.knockback(0.25, self.meta.get("angle", 0), FRAMERATE // 8)
+            self.arena.player.knockback(0.25, self.angle, FRAMERATE // 8)
             self.destroy = True
 
-        if self.timer >= self.meta.get("duration", FRAMERATE // 4):
+        if self.timer >= self.duration:
             self.destroy = True
 
-        for block in self.arena.player.getRoom().layout:
-            if block.x - block.w / 2 < self.x < block.x + block.w / 2:
-                if block.y - block.h / 2 < self.y < block.y + block.h / 2:
-                    self.destroy = True
-                    break
+        if self.room.collision.solidAt(self.x, self.y):
+            self.destroy = True
 
         if self.destroy == True:
-            self.arena.flash(self.x, self.y, 120, FRAMERATE)
-            self.arena.camera.shake(0.75, FRAMERATE // 4)
+            self.room.flash(self.x, self.y, 120, FRAMERATE)
+            self.room.shake(0.75, FRAMERATE // 4)
             for angle in range(0, 360, 5):
-                self.arena.newEntity(
+                self.room.newEntity(
                     "flameball",
                     self.x + 0.25 * math.cos(angle / 180 * math.pi),
                     self.y + 0.25 * math.sin(angle / 180 * math.pi),
@@ -1642,16 +2470,16 @@ class Entity:
         return 0
 
     def animate_rocket(self):
-        return "entity_rocket", self.meta.get("angle", 0)
+        return "entity_rocket", self.angle
 
 
     def damage_aura_wisp(self, amount : int):
         return 0
 
     def tick_aura_wisp(self):
-        if not "angle" in self.meta.keys():
-            self.meta["angle"] = 0
-
+        if not self.room.hasPlayer():
+            self.destroy = True
+            return
         if not self.arena.player.item:
             self.destroy = True
             return
@@ -1659,16 +2487,16 @@ class Entity:
             self.destroy = True
             return
 
-        self.meta["angle"] += 3
-        if self.meta["angle"] > 360:
-            self.meta["angle"] -= 360
+        self.angle += 3
+        if self.angle > 360:
+            self.angle -= 360
 
-        self.x = self.arena.player.x + 1.75 * math.cos(self.meta["angle"] / 180 * math.pi)
-        self.y = self.arena.player.y + 1.75 * math.sin(self.meta["angle"] / 180 * math.pi)
+        self.x = self.arena.player.x + 1.75 * math.cos(self.angle / 180 * math.pi)
+        self.y = self.arena.player.y + 1.75 * math.sin(self.angle / 180 * math.pi)
 
 
-        for entity in self.arena.player.getRoom().entities:
-            if not entity.opponent: continue
+        for entity in self.room.targets.queryRadius(self.x, self.y, REACH):
+            if not entity.kind.opponent: continue
             distance = math.sqrt((entity.x - self.x) ** 2 + (entity.y - self.y) ** 2)
             if distance > (entity.w + entity.h) / 2: continue
             angle = math.atan2(